@@ -4,7 +4,7 @@ import logging
 import sys
 from pathlib import Path
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
@@ -13,7 +13,9 @@ if str(ROOT_DIR.parent) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR.parent))
 
 from core.config import settings  # noqa: E402
+from core.messages import check_wire_format, decoder, encode, is_trusted, unpack  # noqa: E402
 from broker import broker, app, llm_exchange, pinger_exchange  # noqa: E402
+from faststream import Context  # noqa: E402
 from faststream.rabbit import RabbitQueue  # noqa: E402
 from openai_wrapper import OpenAIWrapper  # noqa: E402
 
@@ -22,6 +24,8 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
 
+check_wire_format(settings.rabbit.wire_format)
+
 if not settings.llm.api_key:
     logging.warning("LLM API key is not configured; responses will be sent without explanations")
 
@@ -43,8 +47,26 @@ class PingerMessage(BaseModel):
 @broker.subscriber(
     RabbitQueue("pinger-to-llm-queue", durable=True, routing_key=settings.rabbit.pinger_routing_key),
     pinger_exchange,
+    decoder=decoder,
 )
-async def handle_pinger_message(message: PingerMessage) -> None:
+async def handle_pinger_message(
+    payload: dict,
+    headers: dict = Context("message.headers"),
+    user_id: str | None = Context("message.raw_message.user_id", default=None),
+) -> None:
+    # Пингер может присылать пачку событий в одном конверте (core.messages)
+    trusted = settings.rabbit.trusted_fast_path and is_trusted(headers, user_id, settings.rabbit.trusted_users)
+    for item in unpack(payload):
+        try:
+            # Сообщения нашего пингера уже проверены при сборке — не валидируем их повторно
+            message = PingerMessage.model_construct(**item) if trusted else PingerMessage.model_validate(item)
+        except (TypeError, ValidationError) as exc:
+            logging.warning("[!] Некорректное сообщение от пингера: %s", exc)
+            continue
+        await process_pinger_message(message)
+
+
+async def process_pinger_message(message: PingerMessage) -> None:
     logging.info("[x] Получено сообщение от пингера для сервиса %s (%s)", message.name, message.url)
 
     try:
@@ -58,6 +80,8 @@ async def handle_pinger_message(message: PingerMessage) -> None:
             prompt = (
                 f"Проанализируй состояние сервиса '{message.name}' ({message.url}).\n"
                 f"Последние метрики:\n{json.dumps(message.logs, ensure_ascii=False, indent=2)}\n\n"
+                "Поля dns_ms, connect_ms, tls_ms, ttfb_ms и download_ms — время фаз запроса в мс:"
+                " по ним определи, на каком этапе (DNS, TCP, TLS, бэкенд, передача) возникает задержка.\n"
                 "Сформулируй короткий вывод о статусе и дай рекомендацию, что стоит проверить."
                 " Не используй форматирование Markdown или HTML."
             )
@@ -73,10 +97,12 @@ async def handle_pinger_message(message: PingerMessage) -> None:
             "explanation": explanation,
         }
 
+        body, options = encode(response, settings.rabbit.wire_format, settings.rabbit.login)
         await broker.publish(
-            response,
+            body,
             exchange=llm_exchange,
             routing_key=settings.rabbit.llm_routing_key,
+            **options,
         )
         logging.info("[V] Отправлено в LLM exchange для %s", message.url)
 
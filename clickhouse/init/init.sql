@@ -17,7 +17,12 @@ CREATE TABLE site_logs
     dns_resolved UInt8,
     redirects Nullable(Int32),
     errors_last Nullable(Int32),
-    ping_interval UInt32
+    ping_interval UInt32,
+    dns_ms Nullable(Float32),          -- фазы запроса, мс
+    connect_ms Nullable(Float32),
+    tls_ms Nullable(Float32),
+    ttfb_ms Nullable(Float32),
+    download_ms Nullable(Float32)
 )
 ENGINE = MergeTree
 PARTITION BY toYYYYMM(timestamp)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from functools import lru_cache
 from pathlib import Path
 from typing import List
-from urllib.parse import quote
+from urllib.parse import quote, unquote, urlsplit
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -49,6 +49,10 @@ class RabbitSettings(BaseModel):
     llm_exchange: str = "llm.events"
     llm_queue: str = "llm-to-backend-queue"
     llm_routing_key: str = "llm.group"
+    wire_format: str = "json"
+    trusted_fast_path: bool = False
+    # Пользователи брокера через запятую, чьим сообщениям доверяем без валидации
+    trusted_producers: str = ""
 
     @model_validator(mode="after")
     def _ensure_url(self) -> RabbitSettings:  # type: ignore[override]
@@ -70,6 +74,14 @@ class RabbitSettings(BaseModel):
         object.__setattr__(self, "url", url)
         return self
 
+    @property
+    def login(self) -> str:
+        return unquote(urlsplit(self.url).username or "")
+
+    @property
+    def trusted_users(self) -> frozenset[str]:
+        return frozenset(user.strip() for user in self.trusted_producers.split(",") if user.strip())
+
 
 class BackendSettings(BaseModel):
     host: str = "0.0.0.0"
@@ -87,6 +99,11 @@ class ClickhouseSettings(BaseModel):
     password: str = ""
     database: str = "monitor"
     table: str = "site_logs"
+    batch_rows: int = 5000
+    flush_interval_sec: float = 2.0
+    queue_size: int = 20000
+    max_retries: int = 5
+    retry_backoff_sec: float = 0.5
 
     @property
     def enabled(self) -> bool:
@@ -97,6 +114,72 @@ class PingerSettings(BaseModel):
     interval_sec: int = 5
     input_database_url: str = ""
     notify_always: bool = False
+    http_timeout_sec: float = 10.0
+    # 0 — по числу одновременных проверок (concurrency)
+    http_pool_size: int = 0
+    http_pool_per_host: int = 4
+    http_keepalive_sec: float = 30.0
+    http_max_body_bytes: int = 65536
+    concurrency: int = 200
+    # Дедлайн всей проверки: больше http_timeout_sec, чтобы медленный ответ успел,
+    # но меньше худшего DNS + HTTP (dns_timeout_sec + http_timeout_sec), иначе он не ограничивает ничего
+    check_timeout_sec: float = 12.0
+    dns_default_ttl_sec: float = 60.0
+    dns_min_ttl_sec: float = 5.0
+    dns_max_ttl_sec: float = 3600.0
+    dns_negative_ttl_sec: float = 30.0
+    dns_timeout_sec: float = 5.0
+    dns_nameservers: str = ""
+    cert_refresh_sec: float = 21600.0
+    cert_from_http: bool = True
+    cert_timeout_sec: float = 10.0
+    cert_error_ttl_sec: float = 60.0
+    ping_timeout_sec: float = 3.0
+    pg_pool_min: int = 1
+    pg_pool_max: int = 5
+    pg_flush_rows: int = 500
+    pg_flush_interval_sec: float = 1.0
+    sites_resync_sec: float = 300.0
+    history_size: int = 10
+    history_snapshot_sec: float = 60.0
+    sharding: bool = False
+    worker_id: str = ""
+    shard_buckets: int = 64
+    shard_lease_ttl_sec: float = 30.0
+    shard_heartbeat_sec: float = 10.0
+    processes: int = 1
+    health_interval_sec: float = 30.0
+    adaptive_intervals: bool = False
+    adaptive_floor_sec: float = 5.0
+    adaptive_ceiling_factor: float = 4.0
+    adaptive_stable_checks: int = 10
+    adaptive_settle_checks: int = 3
+    phase_spreading: bool = True
+    check_jitter: float = 0.0
+    overload_policy: str = "none"
+    late_check_sec: float = 1.0
+    max_interval_stretch: float = 4.0
+    publish_max_in_flight: int = 256
+    publish_batch_size: int = 1
+    publish_linger_sec: float = 0.05
+    publish_queue_size: int = 10000
+    publish_max_retries: int = 5
+    publish_retry_backoff_sec: float = 0.5
+    check_log_level: str = "DEBUG"
+    check_log_sample: float = 1.0
+    log_queue_size: int = 10000
+    host_concurrency: int = 4
+    host_rate: float = 5.0
+    host_burst: float = 10.0
+    errors_window: int = 10
+    latency_ewma_alpha: float = 0.3
+
+    @model_validator(mode="after")
+    def _default_http_pool(self) -> PingerSettings:  # type: ignore[override]
+        # Пул меньше concurrency пингер сам поднимает до concurrency (с предупреждением)
+        if self.http_pool_size <= 0:
+            object.__setattr__(self, "http_pool_size", max(1, self.concurrency))
+        return self
 
 
 class DispatcherSettings(BaseModel):
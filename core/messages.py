@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from typing import Any, Collection, Mapping
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# Конверт с пачкой событий пингера; одиночное событие — это сам record сайта
+BATCH_TYPE = "pinger.batch"
+
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+WIRE_FORMATS = ("json", "msgpack")
+# Версия схемы компактного формата; сообщения без неё всегда проходят полную валидацию
+SCHEMA_HEADER = "x-schema-version"
+SCHEMA_VERSION = 1
+
+
+def pack_batch(items: list[dict[str, Any]]) -> dict[str, Any]:
+    """Wrap several pinger events into one message body."""
+    return {"type": BATCH_TYPE, "count": len(items), "items": items}
+
+
+def is_batch(payload: Any) -> bool:
+    return isinstance(payload, dict) and payload.get("type") == BATCH_TYPE
+
+
+def unpack(payload: Any) -> list[Any]:
+    """Return the events of a message: the items of a batch or the message itself."""
+    if is_batch(payload):
+        return list(payload.get("items") or [])
+    return [payload]
+
+
+def check_wire_format(wire_format: str) -> None:
+    """Fail fast on an unknown format or msgpack requested without the package."""
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Unknown wire format {wire_format!r}, expected one of {', '.join(WIRE_FORMATS)}")
+    if wire_format == "msgpack" and msgpack is None:
+        raise RuntimeError("wire format 'msgpack' needs the msgpack package")
+
+
+def encode(payload: Any, wire_format: str = "json", user_id: str = "") -> tuple[Any, dict[str, Any]]:
+    """Return (body, publish kwargs) for broker.publish in the given wire format.
+
+    JSON bodies are left to FastStream's own serializer, so consumers that
+    know nothing about msgpack keep working until it is switched on. Only
+    msgpack messages carry the schema header and, when given, user_id —
+    the broker login of the publishing connection, which RabbitMQ verifies.
+    """
+    if wire_format != "msgpack":
+        return payload, {}
+    check_wire_format(wire_format)
+    options: dict[str, Any] = {"content_type": MSGPACK_CONTENT_TYPE, "headers": {SCHEMA_HEADER: SCHEMA_VERSION}}
+    if user_id:
+        options["user_id"] = user_id
+    return msgpack.packb(payload, use_bin_type=True), options
+
+
+async def decoder(message: Any, original_decoder) -> Any:
+    """FastStream subscriber decoder understanding msgpack next to JSON."""
+    if MSGPACK_CONTENT_TYPE in (getattr(message, "content_type", None) or ""):
+        if msgpack is None:
+            raise RuntimeError("received a msgpack message but the msgpack package is not installed")
+        return msgpack.unpackb(message.body, raw=False)
+    return await original_decoder(message)
+
+
+def is_trusted(headers: Mapping[str, Any] | None, user_id: str | None, producers: Collection[str]) -> bool:
+    """True for current-schema messages published by one of the trusted broker users.
+
+    Headers are set by the producer at will; user_id is not, because RabbitMQ
+    rejects a message whose user_id differs from the connection login.
+    """
+    if not user_id or user_id not in producers:
+        return False
+    try:
+        return int((headers or {}).get(SCHEMA_HEADER)) == SCHEMA_VERSION
+    except (TypeError, ValueError):
+        return False
@@ -30,6 +30,8 @@ class DataBase:
             await conn.execute(text("ALTER TABLE sites ADD COLUMN IF NOT EXISTS last_rtt DOUBLE PRECISION"))
             await conn.execute(text("ALTER TABLE sites ADD COLUMN IF NOT EXISTS skip_notification BOOLEAN DEFAULT FALSE NOT NULL"))
             await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS enabled BOOLEAN DEFAULT TRUE NOT NULL"))
+            for column in ("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "download_ms"):
+                await conn.execute(text(f"ALTER TABLE site_logs ADD COLUMN IF NOT EXISTS {column} DOUBLE PRECISION"))
 
         # -----------------------------   USERS   ----------------------------- #
 
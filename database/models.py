@@ -73,6 +73,11 @@ class SiteLog(Base):
     redirects: Mapped[int | None] = mapped_column(Integer, nullable=True)
     errors_last: Mapped[int | None] = mapped_column(Integer, nullable=True)
     ping_interval: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    dns_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    connect_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    tls_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    ttfb_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    download_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
     raw_logs: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False, default=dict)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
@@ -26,6 +26,13 @@ class LogSnapshot(BaseModel):
     dns_resolved: Optional[bool] = None
     redirects: Optional[int] = None
     errors_last: Optional[int] = None
+    fail_streak: Optional[int] = None
+    latency_ewma_ms: Optional[float] = None
+    dns_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    tls_ms: Optional[float] = None
+    ttfb_ms: Optional[float] = None
+    download_ms: Optional[float] = None
 
 
 class DispatchMessage(BaseModel):
@@ -36,4 +43,14 @@ class DispatchMessage(BaseModel):
     name: Optional[str] = None
     com: Optional[SiteCom] = None
     logs: LogSnapshot = Field(default_factory=LogSnapshot)
-    explanation: Optional[str] = None
+    explanation: Optional[str] = None
+
+    @classmethod
+    def trusted(cls, data: dict[str, Any]) -> "DispatchMessage":
+        """Build from a payload of our own services without validation."""
+        fields = dict(data)
+        com, logs = fields.get("com"), fields.get("logs")
+        if isinstance(com, dict):
+            fields["com"] = SiteCom.model_construct(**com)
+        fields["logs"] = LogSnapshot.model_construct(**logs) if isinstance(logs, dict) else LogSnapshot()
+        return cls.model_construct(**fields)
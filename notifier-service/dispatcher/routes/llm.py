@@ -4,10 +4,12 @@ import asyncio
 import logging
 from typing import Any
 
+from faststream import Context
 from faststream.rabbit import RabbitQueue
 from pydantic import ValidationError
 
 from core.config import settings
+from core.messages import decoder, is_trusted, unpack
 from database import DataBase
 
 from smtp import send_email
@@ -39,14 +41,23 @@ def setup_llm_routes(app, exchange, db: DataBase, antispam: AntiSpamService) ->
         routing_key=settings.rabbit.llm_routing_key,
     )
 
-    @broker.subscriber(queue, exchange=exchange)
-    async def handle_llm_event(payload: dict[str, Any]) -> None:  # type: ignore[override]
-        try:
-            message = DispatchMessage.model_validate(payload)
-        except ValidationError as exc:
-            logger.warning("Invalid LLM payload: %s", exc)
-            return
-
+    @broker.subscriber(queue, exchange=exchange, decoder=decoder)
+    async def handle_llm_event(
+        payload: dict[str, Any],
+        headers: dict[str, Any] = Context("message.headers"),
+        user_id: str | None = Context("message.raw_message.user_id", default=None),
+    ) -> None:  # type: ignore[override]
+        # Events may arrive one per message or packed into a core.messages batch
+        trusted = settings.rabbit.trusted_fast_path and is_trusted(headers, user_id, settings.rabbit.trusted_users)
+        for item in unpack(payload):
+            try:
+                message = DispatchMessage.trusted(item) if trusted else DispatchMessage.model_validate(item)
+            except (TypeError, ValidationError) as exc:
+                logger.warning("Invalid LLM payload: %s", exc)
+                continue
+            await dispatch_event(message)
+
+    async def dispatch_event(message: DispatchMessage) -> None:
         if message.com and message.com.skip_notification:
             logger.info("Skip notification for site %s due to skip flag", message.id)
             return
@@ -19,6 +19,7 @@ def format_telegram(message: DispatchMessage, site: Site) -> str:
         f"🕒 Время: {ctx['timestamp']}\n"
         f"📡 Код ответа: {ctx['http_status']}\n"
         f"⚡ Задержка HTTP: {ctx['latency_ms']} мс\n"
+        f"⏱ Фазы: {ctx['phases']}\n"
         f"📶 Пинг: {ctx['ping_ms']} мс\n"
         f"🔐 SSL дней осталось: {ctx['ssl_days_left']}\n"
         f"🌐 DNS резолвинг: {ctx['dns_resolved']}\n"
@@ -47,6 +48,7 @@ def format_email_bodies(message: DispatchMessage, site: Site) -> tuple[str, str]
         f"Время: {ctx['timestamp']}",
         f"Код ответа: {ctx['http_status']}",
         f"Задержка HTTP: {ctx['latency_ms']} мс",
+        f"Фазы: {ctx['phases']}",
         f"Пинг: {ctx['ping_ms']} мс",
         f"SSL дней осталось: {ctx['ssl_days_left']}",
         f"DNS резолвинг: {ctx['dns_resolved']}",
@@ -67,6 +69,7 @@ def format_email_bodies(message: DispatchMessage, site: Site) -> tuple[str, str]
         _html_row("Время", ctx['timestamp']),
         _html_row("Код ответа", ctx['http_status']),
         _html_row("Задержка HTTP", f"{ctx['latency_ms']} мс"),
+        _html_row("Фазы", ctx['phases']),
         _html_row("Пинг", f"{ctx['ping_ms']} мс"),
         _html_row("SSL дней осталось", ctx['ssl_days_left']),
         _html_row("DNS резолвинг", ctx['dns_resolved']),
@@ -104,6 +107,19 @@ def _build_context(message: DispatchMessage, site: Site) -> dict[str, str]:
     dns_resolved = logs.dns_resolved
     dns_text = "—" if dns_resolved is None else ("OK" if dns_resolved else "FAIL")
 
+    phases = [
+        (label, value)
+        for label, value in (
+            ("DNS", logs.dns_ms),
+            ("TCP", logs.connect_ms),
+            ("TLS", logs.tls_ms),
+            ("TTFB", logs.ttfb_ms),
+            ("загрузка", logs.download_ms),
+        )
+        if value is not None
+    ]
+    phases_text = " / ".join(f"{label} {value:g}" for label, value in phases) + " мс" if phases else "—"
+
     explanation = (message.explanation or "").strip()
 
     return {
@@ -114,6 +130,7 @@ def _build_context(message: DispatchMessage, site: Site) -> dict[str, str]:
         "timestamp": timestamp_text,
         "http_status": _fmt(logs.http_status),
         "latency_ms": _fmt(logs.latency_ms),
+        "phases": phases_text,
         "ping_ms": _fmt(logs.ping_ms),
         "ssl_days_left": _fmt(logs.ssl_days_left),
         "dns_resolved": dns_text,
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+
+class _State:
+    __slots__ = ("last_light", "green_streak", "settle_left", "interval")
+
+    def __init__(self, interval: float) -> None:
+        self.last_light: str | None = None
+        self.green_streak = 0
+        self.settle_left = 0
+        self.interval = interval
+
+
+def _number(value, default: float) -> float:
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+class AdaptiveIntervals:
+    """Per-site check interval policy driven by the traffic light.
+
+    A site whose light changes is checked at its floor interval until it
+    keeps the same light for settle_checks checks (a flapping site therefore
+    stays at the floor). After stable_checks green checks in a row the
+    interval grows by growth per check up to the ceiling. Anything else runs
+    at the configured ping_interval.
+
+    Site.com may override the policy: {"adaptive": bool, "min_interval": sec,
+    "max_interval": sec}.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = False,
+        floor_sec: float = 5.0,
+        ceiling_factor: float = 4.0,
+        stable_checks: int = 10,
+        settle_checks: int = 3,
+        growth: float = 1.5,
+    ) -> None:
+        self.enabled = enabled
+        self.floor_sec = floor_sec
+        self.ceiling_factor = ceiling_factor
+        self.stable_checks = stable_checks
+        self.settle_checks = settle_checks
+        self.growth = growth
+        self._states: dict[int, _State] = {}
+
+    def bounds(self, site: dict) -> tuple[float, float, float]:
+        """Return (floor, base, ceiling) intervals for a site."""
+        com = site.get("com") or {}
+        base = max(1.0, float(site["ping_interval"]))
+        floor = min(base, max(1.0, _number(com.get("min_interval"), min(base, self.floor_sec))))
+        ceiling = max(base, _number(com.get("max_interval"), base * self.ceiling_factor))
+        return floor, base, ceiling
+
+    def observe(self, site: dict, traffic_light: str | None) -> float:
+        """Record a check result and return the interval until the next check."""
+        com = site.get("com") or {}
+        if not com.get("adaptive", self.enabled):
+            self._states.pop(site["id"], None)
+            return max(1.0, float(site["ping_interval"]))
+
+        floor, base, ceiling = self.bounds(site)
+        state = self._states.get(site["id"])
+        if state is None:
+            state = self._states[site["id"]] = _State(base)
+            state.last_light = site.get("last_traffic_light")
+
+        if state.last_light is not None and traffic_light != state.last_light:
+            state.settle_left = self.settle_checks
+        elif state.settle_left:
+            state.settle_left -= 1
+        state.last_light = traffic_light
+        state.green_streak = state.green_streak + 1 if traffic_light == "green" else 0
+
+        if state.settle_left:
+            state.interval = floor
+        elif state.green_streak >= self.stable_checks:
+            state.interval = min(ceiling, max(state.interval, base) * self.growth)
+        else:
+            state.interval = base
+        return state.interval
+
+    def forget(self, site_id: int) -> None:
+        self._states.pop(site_id, None)
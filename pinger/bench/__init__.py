@@ -0,0 +1,4 @@
+"""Synthetic-endpoint benchmark of the pinger.
+
+Run from the pinger directory: python -m bench --help
+"""
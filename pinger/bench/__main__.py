@@ -0,0 +1,259 @@
+"""End-to-end pinger benchmark against a local farm of fake sites.
+
+Starts a fake DNS server and HTTP(S) farm, seeds --sites sites into the
+scratch Postgres database given by --database-url (it must hold no other
+sites; the inserted sites and their logs are removed by id after the run), drives
+pinger_loop.monitor() and reports throughput, sweep time, check latency,
+event-loop lag and Postgres/ClickHouse write rates. Exits with code 1 when
+a threshold from --thresholds is violated.
+
+HTTPS sites need a certificate valid for *.bench.test, e.g.:
+  openssl req -x509 -newkey rsa:2048 -nodes -days 30 -subj /CN=bench.test \\
+    -addext subjectAltName=DNS:*.bench.test -keyout key.pem -out cert.pem
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import ssl
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from .dns_server import FakeDnsServer
+from .farm import Farm, Profile
+from .metrics import CheckRecorder, LoopLag, percentile
+
+ZONE = "bench.test"
+NAME_PREFIX = "bench-"
+DEFAULT_THRESHOLDS = Path(__file__).with_name("thresholds.json")
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=1000)
+    parser.add_argument("--interval", type=int, default=30, help="ping_interval of the seeded sites, sec")
+    parser.add_argument("--warmup", type=float, default=None, help="sec before measuring (default: one interval)")
+    parser.add_argument("--duration", type=float, default=None, help="measured sec (default: three intervals)")
+    parser.add_argument("--database-url", required=True, help="scratch Postgres database, never the production one")
+    parser.add_argument(
+        "--allow-existing-sites",
+        action="store_true",
+        help="run even if the database already has sites (the pinger will check and update them too)",
+    )
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--redirect-rate", type=float, default=0.05)
+    parser.add_argument("--redirect-hops", type=int, default=2)
+    parser.add_argument("--slow-rate", type=float, default=0.01)
+    parser.add_argument("--slow-delay-ms", type=float, default=200.0)
+    parser.add_argument("--body-bytes", type=int, default=4096)
+    parser.add_argument("--dns-error-rate", type=float, default=0.0)
+    parser.add_argument("--dns-ttl", type=int, default=60)
+    parser.add_argument("--https-share", type=float, default=0.0, help="share of HTTPS sites, needs --tls-cert/--tls-key")
+    parser.add_argument("--tls-cert")
+    parser.add_argument("--tls-key")
+    parser.add_argument("--publish", action="store_true", help="publish results to RabbitMQ instead of dropping them")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded sites after the run")
+    parser.add_argument("--thresholds", type=Path, default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--no-gate", action="store_true", help="report only, never fail")
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if args.https_share > 0 and not (args.tls_cert and args.tls_key):
+        parser.error("--https-share needs --tls-cert and --tls-key")
+    if args.warmup is None:
+        args.warmup = float(args.interval)
+    if args.duration is None:
+        args.duration = 3.0 * args.interval
+    return args
+
+
+async def _seed(pool, urls: list[str], interval: int, allow_existing: bool) -> list[int]:
+    """Insert the bench sites and return their ids."""
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            existing = await conn.fetchval("SELECT count(*) FROM sites")
+            if existing and not allow_existing:
+                raise SystemExit(
+                    f"The database already has {existing} sites and does not look like a scratch one; "
+                    "pass --allow-existing-sites to run anyway"
+                )
+            rows = await conn.fetch(
+                "INSERT INTO sites (url, name, ping_interval)"
+                " SELECT unnest($1::text[]), unnest($2::text[]), $3 RETURNING id",
+                urls,
+                [f"{NAME_PREFIX}{n}" for n in range(len(urls))],
+                interval,
+            )
+    return [row["id"] for row in rows]
+
+
+async def _cleanup(conn, site_ids: list[int]) -> None:
+    # Удаляем только вставленное бенчмарком: по именам можно задеть сайты пользователей
+    await conn.execute("DELETE FROM site_logs WHERE site_id = ANY($1::int[])", site_ids)
+    await conn.execute("DELETE FROM sites WHERE id = ANY($1::int[])", site_ids)
+
+
+def _ratio(value: float | None, expected: float) -> float | None:
+    return round(value / expected, 3) if value is not None and expected else None
+
+
+def _ms(value: float | None) -> float | None:
+    return round(value, 2) if value is not None else None
+
+
+def check_gates(report: dict, thresholds: dict) -> list[str]:
+    """Return human-readable violations of {"min": {...}, "max": {...}}."""
+    failures = []
+    for bound, limits in (("min", thresholds.get("min", {})), ("max", thresholds.get("max", {}))):
+        for name, limit in limits.items():
+            value = report.get(name)
+            if value is None:
+                continue
+            if (bound == "min" and value < limit) or (bound == "max" and value > limit):
+                failures.append(f"{name} = {value} ({bound} {limit})")
+    return failures
+
+
+async def run(args: argparse.Namespace) -> dict:
+    profile = Profile(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        redirect_rate=args.redirect_rate,
+        redirect_hops=args.redirect_hops,
+        slow_rate=args.slow_rate,
+        slow_chunk_delay_ms=args.slow_delay_ms,
+        body_bytes=args.body_bytes,
+    )
+    ssl_context = None
+    if args.tls_cert:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(args.tls_cert, args.tls_key)
+    dns = FakeDnsServer(zone=ZONE, ttl=args.dns_ttl, error_rate=args.dns_error_rate)
+    farm = Farm(profile, ssl_context=ssl_context)
+    await dns.start()
+    await farm.start()
+
+    # Настройки пингера читаются при импорте, поэтому окружение готовим заранее
+    os.environ["PINGER__DNS_NAMESERVERS"] = dns.nameserver
+    os.environ["DATABASE__MAIN_URL"] = args.database_url
+    # PINGER__INPUT_DATABASE_URL у пингера главнее DATABASE__MAIN_URL
+    os.environ["PINGER__INPUT_DATABASE_URL"] = args.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+    if args.tls_cert:
+        os.environ["SSL_CERT_FILE"] = os.path.abspath(args.tls_cert)
+    import pinger_loop
+
+    https_every = round(1 / args.https_share) if args.https_share > 0 else 0
+    urls = [farm.url(n, ZONE, tls=bool(https_every) and n % https_every == 0) for n in range(args.sites)]
+
+    recorder = CheckRecorder(pinger_loop.check_site, args.sites, prefix=NAME_PREFIX)
+    published = 0
+
+    async def drop_publish(record: dict, skip_notification: bool) -> None:
+        nonlocal published
+        published += 1
+
+    pinger_loop.check_site = recorder
+    if args.publish:
+        await pinger_loop.broker.start()
+    else:
+        pinger_loop._publish = drop_publish
+
+    pinger_loop.LOG_PIPELINE.start()
+    await pinger_loop.PG_WRITER.start()
+    site_ids = await _seed(pinger_loop.PG_WRITER.pool, urls, args.interval, args.allow_existing_sites)
+    if pinger_loop.SHARDS is not None:
+        await pinger_loop.SHARDS.setup()
+    try:
+        await pinger_loop.CH_SINK.start()
+    except Exception as exc:
+        logging.warning("ClickHouse is unavailable, export disabled: %s", exc)
+
+    lag = LoopLag()
+    lag.start()
+    monitor = asyncio.create_task(pinger_loop.monitor())
+    try:
+        await asyncio.sleep(args.warmup)
+        checks_before = pinger_loop.CHECKS_DONE
+        pg_before = pinger_loop.PG_WRITER.stats["log_rows"]
+        ch_before = pinger_loop.CH_SINK.stats["rows"]
+        lag.samples.clear()
+        recorder.recording = True
+        measured_from = time.monotonic()
+        await asyncio.sleep(args.duration)
+        elapsed = time.monotonic() - measured_from
+        checks = pinger_loop.CHECKS_DONE - checks_before
+        pg_rows = pinger_loop.PG_WRITER.stats["log_rows"] - pg_before
+        ch_rows = pinger_loop.CH_SINK.stats["rows"] - ch_before
+    finally:
+        lag.stop()
+        monitor.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await monitor
+        if not args.keep and pinger_loop.PG_WRITER.pool is not None:
+            async with pinger_loop.PG_WRITER.pool.acquire() as conn:
+                await _cleanup(conn, site_ids)
+        await pinger_loop.stop_monitor()
+        if args.publish:
+            await pinger_loop.broker.close()
+        await farm.close()
+        dns.close()
+
+    sweeps = recorder.sweep_durations()
+    checks_per_sec = checks / elapsed if elapsed else None
+    sweep_sec = statistics.median(sweeps[1:]) if len(sweeps) > 1 else None
+    report = {
+        "sites": args.sites,
+        "interval_sec": args.interval,
+        "measured_sec": round(elapsed, 1),
+        "checks": checks,
+        "checks_per_sec": round(checks_per_sec, 1) if checks_per_sec is not None else None,
+        "schedule_ratio": _ratio(checks_per_sec, args.sites / args.interval),
+        "first_sweep_sec": round(sweeps[0], 2) if sweeps else None,
+        "sweep_sec": round(sweep_sec, 2) if sweep_sec is not None else None,
+        "sweep_ratio": _ratio(sweep_sec, args.interval),
+        "check_p50_ms": _ms(percentile(recorder.latencies_ms, 50)),
+        "check_p99_ms": _ms(percentile(recorder.latencies_ms, 99)),
+        "loop_lag_p50_ms": _ms(percentile(lag.samples, 50)),
+        "loop_lag_p99_ms": _ms(percentile(lag.samples, 99)),
+        "loop_lag_max_ms": _ms(max(lag.samples, default=None)),
+        "pg_rows_per_sec": round(pg_rows / elapsed, 1) if elapsed else None,
+        "pg_write_ratio": _ratio(pg_rows, checks),
+        "ch_rows_per_sec": round(ch_rows / elapsed, 1) if elapsed and pinger_loop.CH_SINK.stats["flushes"] else None,
+        "farm_requests": farm.requests,
+        "dns_queries": dns.queries,
+        "published": published if not args.publish else None,
+    }
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    # JSON-записи проверок идут в stdout; писатель лога работает как в бою, но в /dev/null
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        report = asyncio.run(run(args))
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.no_gate:
+        return 0
+    thresholds = json.loads(args.thresholds.read_text(encoding="utf-8"))
+    failures = check_gates(report, thresholds)
+    for failure in failures:
+        print(f"[✗] {failure}", file=sys.stderr)
+    if not failures:
+        print("[✓] all thresholds met", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import socket
+import struct
+
+_HEADER = struct.Struct("!HHHHHH")
+_RCODE_NXDOMAIN = 3
+_TYPE_A = 1
+_CLASS_IN = 1
+
+
+def _parse_question(packet: bytes) -> tuple[str, int, int, int]:
+    """Return (name, qtype, qclass, end offset) of the first question."""
+    offset = _HEADER.size
+    labels = []
+    while True:
+        length = packet[offset]
+        offset += 1
+        if length == 0:
+            break
+        labels.append(packet[offset : offset + length].decode("ascii", "replace"))
+        offset += length
+    qtype, qclass = struct.unpack_from("!HH", packet, offset)
+    return ".".join(labels).lower(), qtype, qclass, offset + 4
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, server: "FakeDnsServer") -> None:
+        self.server = server
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        try:
+            reply = self.server.answer(data)
+        except (IndexError, struct.error):
+            return
+        self.server.queries += 1
+        self.transport.sendto(reply, addr)
+
+
+class FakeDnsServer:
+    """UDP DNS server answering A queries for *.zone with one fixed address.
+
+    error_rate of the queries get NXDOMAIN, and every answer carries ttl so
+    the pinger's resolver cache sees realistic expiry.
+    """
+
+    def __init__(
+        self,
+        *,
+        zone: str = "bench.test",
+        address: str = "127.0.0.1",
+        ttl: int = 60,
+        error_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.zone = zone.lower().strip(".")
+        self.address = socket.inet_aton(address)
+        self.ttl = ttl
+        self.error_rate = error_rate
+        self.host = host
+        self.port = port
+        self.queries = 0
+        self._transport: asyncio.DatagramTransport | None = None
+
+    def answer(self, query: bytes) -> bytes:
+        ident, flags, qdcount, _, _, _ = _HEADER.unpack_from(query)
+        name, qtype, qclass, end = _parse_question(query)
+        question = query[_HEADER.size : end]
+        known = name == self.zone or name.endswith("." + self.zone)
+        # QR=1, копируем opcode и RD, RA=1
+        reply_flags = 0x8080 | (flags & 0x7900)
+        if not known or random.random() < self.error_rate:
+            return _HEADER.pack(ident, reply_flags | _RCODE_NXDOMAIN, 1, 0, 0, 0) + question
+        if qtype != _TYPE_A or qclass != _CLASS_IN:
+            return _HEADER.pack(ident, reply_flags, 1, 0, 0, 0) + question
+        record = struct.pack("!HHHIH", 0xC00C, _TYPE_A, _CLASS_IN, self.ttl, 4) + self.address
+        return _HEADER.pack(ident, reply_flags, 1, 1, 0, 0) + question + record
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _Protocol(self), local_addr=(self.host, self.port)
+        )
+        self.port = self._transport.get_extra_info("sockname")[1]
+
+    @property
+    def nameserver(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
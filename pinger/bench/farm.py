@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import ssl
+
+from aiohttp import web
+
+
+class Profile:
+    """Behaviour of the fake endpoints, drawn independently for every request.
+
+    Latency is log-normal around latency_ms (sigma = latency_sigma); error_rate
+    of the requests answer 5xx, redirect_rate walk a chain of redirect_hops
+    302s first, and slow_rate stream their body in chunks slow_chunk_delay_ms
+    apart.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency_ms: float = 50.0,
+        latency_sigma: float = 0.5,
+        max_latency_ms: float = 10_000.0,
+        error_rate: float = 0.02,
+        redirect_rate: float = 0.05,
+        redirect_hops: int = 2,
+        slow_rate: float = 0.01,
+        slow_chunk_delay_ms: float = 200.0,
+        body_bytes: int = 4096,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.max_latency_ms = max_latency_ms
+        self.error_rate = error_rate
+        self.redirect_rate = redirect_rate
+        self.redirect_hops = redirect_hops
+        self.slow_rate = slow_rate
+        self.slow_chunk_delay_ms = slow_chunk_delay_ms
+        self.body_bytes = body_bytes
+
+    def latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        value = random.lognormvariate(math.log(self.latency_ms), self.latency_sigma)
+        return min(value, self.max_latency_ms) / 1000
+
+
+class Farm:
+    """aiohttp server impersonating any number of monitored sites.
+
+    Site n lives at /site/n; the Host header is ignored, so every
+    s<n>.<zone> name served by the fake DNS lands here. With an SSL context
+    the same handlers are also served over HTTPS on a second port.
+    """
+
+    def __init__(
+        self,
+        profile: Profile,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ssl_context: ssl.SSLContext | None = None,
+        tls_port: int = 0,
+    ) -> None:
+        self.profile = profile
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.tls_port = tls_port
+        self.requests = 0
+        self._runner: web.AppRunner | None = None
+        self._body = b"x" * profile.body_bytes
+
+    async def _site(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        profile = self.profile
+        await asyncio.sleep(profile.latency())
+        roll = random.random()
+        if roll < profile.error_rate:
+            return web.Response(status=random.choice((500, 502, 503)), text="fake failure")
+        roll -= profile.error_rate
+        if roll < profile.redirect_rate and profile.redirect_hops > 0:
+            raise web.HTTPFound(f"/hop/{request.match_info['site']}/{profile.redirect_hops}")
+        roll -= profile.redirect_rate
+        if roll < profile.slow_rate:
+            return await self._slow_body(request)
+        return web.Response(body=self._body, content_type="text/plain")
+
+    async def _hop(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        left = int(request.match_info["left"]) - 1
+        if left > 0:
+            raise web.HTTPFound(f"/hop/{request.match_info['site']}/{left}")
+        return web.Response(body=self._body, content_type="text/plain")
+
+    async def _slow_body(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/plain"})
+        response.content_length = len(self._body)
+        await response.prepare(request)
+        chunk = max(1, len(self._body) // 4)
+        for start in range(0, len(self._body), chunk):
+            await response.write(self._body[start : start + chunk])
+            await asyncio.sleep(self.profile.slow_chunk_delay_ms / 1000)
+        await response.write_eof()
+        return response
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/site/{site}", self._site)
+        app.router.add_get("/hop/{site}/{left}", self._hop)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port, backlog=4096)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        if self.ssl_context is not None:
+            tls_site = web.TCPSite(self._runner, self.host, self.tls_port, ssl_context=self.ssl_context, backlog=4096)
+            await tls_site.start()
+            self.tls_port = tls_site._server.sockets[0].getsockname()[1]
+
+    def url(self, n: int, zone: str, *, tls: bool = False) -> str:
+        if tls:
+            return f"https://s{n}.{zone}:{self.tls_port}/site/{n}"
+        return f"http://s{n}.{zone}:{self.port}/site/{n}"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class LoopLag:
+    """Samples event-loop lag: how late a sleep(interval) wakes up."""
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval) * 1000)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+
+class CheckRecorder:
+    """Wraps pinger_loop.check_site to time checks and track sweeps.
+
+    Only sites whose name starts with prefix are measured. A sweep ends when
+    every one of them has been checked once more; the gaps between sweep
+    ends give the sweep duration under steady load.
+    """
+
+    def __init__(self, check: Callable[[dict], Awaitable], sites: int, *, prefix: str = "") -> None:
+        self._check = check
+        self.sites = sites
+        self.prefix = prefix
+        self.latencies_ms: list[float] = []
+        self.recording = False
+        self.started = time.monotonic()
+        self.sweeps: list[float] = []
+        self._counts: dict[int, int] = {}
+        self._rounds: dict[int, int] = {}
+
+    async def __call__(self, site: dict):
+        if not site["name"].startswith(self.prefix):
+            return await self._check(site)
+        started = time.perf_counter()
+        try:
+            return await self._check(site)
+        finally:
+            if self.recording:
+                self.latencies_ms.append((time.perf_counter() - started) * 1000)
+            self._count(site["id"])
+
+    def _count(self, site_id: int) -> None:
+        count = self._counts.get(site_id, 0) + 1
+        self._counts[site_id] = count
+        done = self._rounds.get(count, 0) + 1
+        self._rounds[count] = done
+        if done == self.sites:
+            self.sweeps.append(time.monotonic() - self.started)
+            del self._rounds[count]
+
+    def sweep_durations(self) -> list[float]:
+        """Duration of the first sweep, then of every following one."""
+        ends = self.sweeps
+        return [end - start for start, end in zip([0.0, *ends], ends)]
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import datetime as dt
+import logging
+import ssl
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def parse_not_after(cert: dict | None) -> dt.datetime | None:
+    """Extract notAfter from a getpeercert() dict."""
+    if not cert or "notAfter" not in cert:
+        return None
+    return dt.datetime.strptime(cert["notAfter"], "%b %d %H:%M:%S %Y %Z")
+
+
+async def fetch_cert_not_after(
+    hostname: str, port: int = 443, timeout: float = 10, address: str | None = None
+) -> dt.datetime | None:
+    """Open a dedicated TLS connection and return the certificate's notAfter.
+
+    The connection is closed before returning, waiting at most timeout for
+    the TLS close_notify exchange.
+    """
+    context = ssl.create_default_context()
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(address or hostname, port, ssl=context, server_hostname=hostname),
+        timeout=timeout,
+    )
+    try:
+        return parse_not_after(writer.get_extra_info("peercert"))
+    finally:
+        writer.close()
+        # Сервер может так и не ответить на close_notify — не ждём дольше таймаута
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(writer.wait_closed(), timeout=timeout)
+
+
+class _CertEntry:
+    __slots__ = ("not_after", "expires")
+
+    def __init__(self, not_after: dt.datetime | None, expires: float) -> None:
+        self.not_after = not_after
+        self.expires = expires
+
+
+def _days(entry: _CertEntry) -> int | None:
+    if entry.not_after is None:
+        return None
+    return (entry.not_after - dt.datetime.utcnow()).days
+
+
+class CertCache:
+    """Certificate expiry cache keyed by host:port.
+
+    Entries are filled either from a peer certificate seen by the HTTP probe
+    or, when nothing fresh is cached, by a dedicated TLS handshake. Failed
+    handshakes are remembered for error_ttl so dead hosts are not hammered.
+    """
+
+    def __init__(self, *, refresh_sec: float = 21600.0, error_ttl: float = 60.0, timeout: float = 10.0) -> None:
+        self.refresh_sec = refresh_sec
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self._entries: dict[tuple[str, int], _CertEntry] = {}
+        self._inflight: dict[tuple[str, int], asyncio.Task] = {}
+
+    def store_peercert(self, hostname: str, port: int, cert: dict | None) -> None:
+        """Remember the certificate taken from an already established TLS connection."""
+        not_after = parse_not_after(cert)
+        if not_after is not None:
+            key = (hostname.lower(), port)
+            self._entries[key] = _CertEntry(not_after, time.monotonic() + self.refresh_sec)
+
+    def is_fresh(self, hostname: str, port: int = 443) -> bool:
+        entry = self._entries.get((hostname.lower(), port))
+        return entry is not None and entry.expires > time.monotonic()
+
+    def peek(self, hostname: str, port: int = 443) -> int | None:
+        """Days left according to the cached entry, even a stale one; None when nothing is known."""
+        entry = self._entries.get((hostname.lower(), port))
+        return _days(entry) if entry is not None else None
+
+    async def days_left(self, hostname: str, port: int = 443, address: str | None = None) -> int | None:
+        """Return days until the certificate expires, or None when it is unavailable."""
+        key = (hostname.lower(), port)
+        entry = self._entries.get(key)
+        if entry is None or entry.expires <= time.monotonic():
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._refresh(key, address))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+            entry = await asyncio.shield(task)
+        return _days(entry)
+
+    async def _refresh(self, key: tuple[str, int], address: str | None) -> _CertEntry:
+        hostname, port = key
+        try:
+            not_after = await fetch_cert_not_after(hostname, port, self.timeout, address)
+            ttl = self.refresh_sec if not_after is not None else self.error_ttl
+        except Exception as exc:
+            logger.debug("TLS handshake failed for %s:%s: %s", hostname, port, exc)
+            not_after, ttl = None, self.error_ttl
+        entry = _CertEntry(not_after, time.monotonic() + ttl)
+        self._entries[key] = entry
+        return entry
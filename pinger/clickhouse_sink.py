@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+
+try:
+    import clickhouse_connect  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    clickhouse_connect = None
+
+from core.config import ClickhouseSettings
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "id",
+    "url",
+    "name",
+    "timestamp",
+    "traffic_light",
+    "http_status",
+    "latency_ms",
+    "ping_ms",
+    "ssl_days_left",
+    "dns_resolved",
+    "redirects",
+    "errors_last",
+    "ping_interval",
+    "dns_ms",
+    "connect_ms",
+    "tls_ms",
+    "ttfb_ms",
+    "download_ms",
+)
+PHASE_COLUMNS = ("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "download_ms")
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id UInt64,
+        url String,
+        name String,
+        timestamp DateTime,
+        traffic_light String,
+        http_status Nullable(Int32),
+        latency_ms Nullable(Int32),
+        ping_ms Nullable(Float64),
+        ssl_days_left Nullable(Int32),
+        dns_resolved UInt8,
+        redirects Nullable(Int32),
+        errors_last Nullable(Int32),
+        ping_interval UInt32,
+        dns_ms Nullable(Float32),
+        connect_ms Nullable(Float32),
+        tls_ms Nullable(Float32),
+        ttfb_ms Nullable(Float32),
+        download_ms Nullable(Float32)
+    ) ENGINE = MergeTree()
+    ORDER BY (url, timestamp)
+"""
+# Таблицы, созданные до появления фазовых метрик, дополняем колонками
+_ADD_PHASE_COLUMN_SQL = "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} Nullable(Float32)"
+
+
+class ClickHouseSink:
+    """Buffered columnar sink for check results.
+
+    Rows go through a bounded queue, are collected column by column and
+    inserted as one block once batch_rows rows are buffered or the oldest
+    row is flush_interval_sec old. Failed inserts are retried with
+    exponential backoff, and the buffer is flushed on close(). put() never
+    waits: while ClickHouse is slow or down and the queue is full, new rows
+    are dropped and counted in stats["overflow_rows"], so analytics can't
+    hold up Postgres writes and alerts.
+    """
+
+    def __init__(self, config: ClickhouseSettings) -> None:
+        self.config = config
+        self.client = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, config.queue_size))
+        self._columns: list[list] = [[] for _ in COLUMNS]
+        self._rows = 0
+        self._first_at = 0.0
+        self._task: asyncio.Task | None = None
+        self._overflowing = False
+        self.stats = {"rows": 0, "flushes": 0, "retries": 0, "dropped_rows": 0, "overflow_rows": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    async def start(self) -> None:
+        if not self.config.enabled:
+            return
+        if clickhouse_connect is None:
+            logger.warning("clickhouse-connect is not installed; disabling ClickHouse export")
+            return
+        self.client = await asyncio.to_thread(
+            clickhouse_connect.get_client,
+            host=self.config.host,
+            port=self.config.port,
+            username=self.config.user,
+            password=self.config.password,
+            database=self.config.database,
+        )
+        await asyncio.to_thread(self.client.command, _CREATE_TABLE_SQL.format(table=self.config.table))
+        for column in PHASE_COLUMNS:
+            await asyncio.to_thread(
+                self.client.command, _ADD_PHASE_COLUMN_SQL.format(table=self.config.table, column=column)
+            )
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, record: dict, logs: dict, ping_interval: int) -> None:
+        """Queue a check result; drop it when the queue is full."""
+        if self._task is None:
+            return
+        if self._queue.full():
+            self.stats["overflow_rows"] += 1
+            if not self._overflowing:
+                self._overflowing = True
+                logger.warning("ClickHouse queue is full (%d rows), dropping new rows", self._queue.maxsize)
+            return
+        self._overflowing = False
+        self._queue.put_nowait(
+            (
+                record["id"],
+                record["url"],
+                record["name"],
+                datetime.strptime(logs["timestamp"], "%Y-%m-%dT%H:%M:%S"),
+                logs.get("traffic_light"),
+                logs.get("http_status"),
+                logs.get("latency_ms"),
+                logs.get("ping_ms"),
+                logs.get("ssl_days_left"),
+                1 if logs.get("dns_resolved") else 0,
+                logs.get("redirects"),
+                logs.get("errors_last"),
+                ping_interval,
+                *(logs.get(column) for column in PHASE_COLUMNS),
+            )
+        )
+
+    async def close(self) -> None:
+        """Flush everything still queued or buffered and stop the sink."""
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+        if self.client is not None:
+            await asyncio.to_thread(self.client.close)
+            self.client = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            timeout = None
+            if self._rows:
+                timeout = max(0.0, self._first_at + self.config.flush_interval_sec - loop.time())
+            try:
+                row = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self._flush()
+                continue
+            if row is None:
+                await self._flush()
+                return
+            if not self._rows:
+                self._first_at = loop.time()
+            for column, value in zip(self._columns, row):
+                column.append(value)
+            self._rows += 1
+            if self._rows >= self.config.batch_rows:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._rows:
+            return
+        columns, rows = self._columns, self._rows
+        self._columns = [[] for _ in COLUMNS]
+        self._rows = 0
+
+        delay = self.config.retry_backoff_sec
+        for attempt in range(self.config.max_retries + 1):
+            try:
+                await asyncio.to_thread(
+                    self.client.insert,
+                    self.config.table,
+                    columns,
+                    column_names=list(COLUMNS),
+                    column_oriented=True,
+                )
+            except Exception as exc:  # pragma: no cover - diagnostics only
+                if attempt == self.config.max_retries:
+                    logger.warning("Dropping %d ClickHouse rows after %d attempts: %s", rows, attempt + 1, exc)
+                    self.stats["dropped_rows"] += rows
+                    return
+                logger.warning("ClickHouse insert failed (attempt %d), retrying in %.1fs: %s", attempt + 1, delay, exc)
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+            else:
+                self.stats["rows"] += rows
+                self.stats["flushes"] += 1
+                return
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import math
+import time
+from array import array
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+TRAFFIC_LIGHTS = ("green", "orange", "red")
+
+# Метрики, которые хранятся в кольцевом буфере: имя -> typecode массива.
+# None кодируется как NaN для "d", _INT_NONE для "q" и -1 для булевых "b".
+FIELDS = (
+    ("http_status", "q"),
+    ("latency_ms", "q"),
+    ("ping_ms", "d"),
+    ("ssl_days_left", "q"),
+    ("dns_resolved", "b"),
+    ("dns_ms", "d"),
+    ("redirects", "q"),
+)
+_INT_NONE = -(2**63)
+_FIELD_INDEX = {name: index for index, (name, _) in enumerate(FIELDS)}
+_TRAFFIC_CODES = {name: code for code, name in enumerate(TRAFFIC_LIGHTS)}
+_EMPTY = {"q": _INT_NONE, "d": math.nan, "b": -1}
+
+
+def _encode(typecode: str, value):
+    if value is None:
+        return _EMPTY[typecode]
+    try:
+        if typecode == "d":
+            return float(value)
+        if typecode == "b":
+            return 1 if value else 0
+        return int(value)
+    except (TypeError, ValueError):
+        return _EMPTY[typecode]
+
+
+def _decode(typecode: str, value):
+    if typecode == "d":
+        return None if math.isnan(value) else value
+    if typecode == "b":
+        return None if value < 0 else bool(value)
+    return None if value == _INT_NONE else value
+
+
+def _parse_timestamp(value) -> float:
+    try:
+        return time.mktime(time.strptime(value, TIMESTAMP_FORMAT))
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class MetricHistory:
+    """Fixed-size ring buffer of recent check metrics for one site.
+
+    Every metric lives in its own typed array, so a site costs a few
+    hundred bytes instead of a list of dicts. Entries are rebuilt as dicts
+    only when asked for via recent() or to_list().
+    """
+
+    __slots__ = ("capacity", "_size", "_head", "_timestamps", "_traffic", "_columns")
+
+    def __init__(self, capacity: int = 10) -> None:
+        self.capacity = max(1, capacity)
+        self._size = 0
+        self._head = 0
+        self._timestamps = array("d", [math.nan]) * self.capacity
+        self._traffic = array("b", [-1]) * self.capacity
+        self._columns = tuple(array(typecode, [_EMPTY[typecode]]) * self.capacity for _, typecode in FIELDS)
+
+    @classmethod
+    def from_list(cls, entries: list[dict] | None, capacity: int = 10) -> "MetricHistory":
+        """Seed a buffer from the JSON history stored in Postgres."""
+        ring = cls(capacity)
+        for entry in (entries or [])[-ring.capacity:]:
+            if isinstance(entry, dict):
+                ring.append(entry)
+        return ring
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, logs: dict) -> None:
+        slot = self._head
+        self._timestamps[slot] = _parse_timestamp(logs.get("timestamp"))
+        self._traffic[slot] = _TRAFFIC_CODES.get(logs.get("traffic_light"), -1)
+        for column, (name, typecode) in zip(self._columns, FIELDS):
+            column[slot] = _encode(typecode, logs.get(name))
+        self._head = (slot + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def _entry(self, slot: int) -> dict:
+        timestamp = self._timestamps[slot]
+        traffic = self._traffic[slot]
+        entry = {
+            "timestamp": None if math.isnan(timestamp) else time.strftime(TIMESTAMP_FORMAT, time.localtime(timestamp)),
+            "traffic_light": TRAFFIC_LIGHTS[traffic] if traffic >= 0 else None,
+        }
+        for column, (name, typecode) in zip(self._columns, FIELDS):
+            entry[name] = _decode(typecode, column[slot])
+        return entry
+
+    def recent(self, n: int | None = None) -> list[dict]:
+        """Return the last n entries (all by default), oldest first."""
+        count = self._size if n is None else max(0, min(n, self._size))
+        start = self._head - count
+        return [self._entry((start + i) % self.capacity) for i in range(count)]
+
+    def values(self, name: str, n: int | None = None) -> list[float]:
+        """Last n values of one metric as floats (None -> NaN), oldest first."""
+        index = _FIELD_INDEX[name]
+        column, typecode = self._columns[index], FIELDS[index][1]
+        count = self._size if n is None else max(0, min(n, self._size))
+        start = self._head - count
+        values = []
+        for i in range(count):
+            value = _decode(typecode, column[(start + i) % self.capacity])
+            values.append(math.nan if value is None else float(value))
+        return values
+
+    def to_list(self) -> list[dict]:
+        """JSON-ready snapshot for sites.history."""
+        return self.recent()
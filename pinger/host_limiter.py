@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class Throttled(Exception):
+    """The request was cancelled before the host's budget let it through."""
+
+
+def _number(value, default: float, cast=float):
+    try:
+        return cast(value) if value is not None else cast(default)
+    except (TypeError, ValueError):
+        return cast(default)
+
+
+class _HostBudget:
+    __slots__ = ("limit", "in_use", "waiters", "rate", "burst", "tokens", "updated")
+
+    def __init__(self, limit: int, rate: float, burst: float) -> None:
+        self.limit = limit
+        self.in_use = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve_token(self) -> float:
+        """Take one token and return how long to wait until it is actually available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Токены уходят в минус: каждый следующий запрос ждёт своей очереди в темпе rate
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def refund_token(self) -> None:
+        """Give back the token of a request that was cancelled before it was sent."""
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def idle(self, now: float) -> bool:
+        """Nothing in flight or waiting and the bucket refilled: the budget can be forgotten."""
+        if self.in_use or self.waiters:
+            return False
+        return self.rate <= 0 or self.tokens + (now - self.updated) * self.rate >= self.burst
+
+    def wake(self) -> None:
+        while self.waiters and self.in_use < self.limit:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_use += 1
+                waiter.set_result(None)
+
+
+class HostLimiter:
+    """Per-host politeness budget: a concurrency cap plus a token bucket.
+
+    Limits are given per call, so sites on the same host may override them;
+    the most recent values win for that host. The budget is per process:
+    share scales every limit (defaults and overrides) to this process's
+    part, e.g. 1/N for N local worker processes. Separate replicas are not
+    known here, so their budgets add up. A request cancelled while waiting
+    returns its token, and budgets of idle hosts are dropped every
+    sweep_sec seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: int = 4,
+        rate: float = 5.0,
+        burst: float = 10.0,
+        share: float = 1.0,
+        sweep_sec: float = 300.0,
+    ) -> None:
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.share = share if 0 < share <= 1 else 1.0
+        self.sweep_sec = sweep_sec
+        self._hosts: dict[str, _HostBudget] = {}
+        self._swept_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    def _budget(self, host: str, concurrency: int | None, rate: float | None, burst: float | None) -> _HostBudget:
+        limit = max(1, int(_number(concurrency, self.concurrency, int) * self.share))
+        rate = _number(rate, self.rate) * self.share
+        burst = max(1.0, _number(burst, self.burst) * self.share)
+        now = time.monotonic()
+        if now - self._swept_at >= self.sweep_sec:
+            self._sweep(now)
+        budget = self._hosts.get(host)
+        if budget is None:
+            budget = self._hosts[host] = _HostBudget(limit, rate, burst)
+        else:
+            budget.limit, budget.rate, budget.burst = limit, rate, burst
+        return budget
+
+    def _sweep(self, now: float) -> None:
+        self._swept_at = now
+        for host in [host for host, budget in self._hosts.items() if budget.idle(now)]:
+            del self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        host: str | None,
+        *,
+        concurrency: int | None = None,
+        rate: float | None = None,
+        burst: float | None = None,
+    ):
+        """Wait for the host's rate budget and a free concurrency slot."""
+        if not host:
+            yield
+            return
+        budget = self._budget(host.lower(), concurrency, rate, burst)
+        delay = budget.reserve_token()
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+
+            if budget.in_use < budget.limit and not budget.waiters:
+                budget.in_use += 1
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                budget.waiters.append(waiter)
+                try:
+                    await waiter
+                except BaseException:
+                    if waiter.done() and not waiter.cancelled():
+                        # Слот уже выдан — возвращаем его следующему
+                        budget.in_use -= 1
+                        budget.wake()
+                    else:
+                        with contextlib.suppress(ValueError):
+                            budget.waiters.remove(waiter)
+                    raise
+        except BaseException:
+            # Запрос так и не ушёл: без возврата токена отменённые ожидания копили бы долг хоста
+            budget.refund_token()
+            raise
+        try:
+            yield
+        finally:
+            budget.in_use -= 1
+            budget.wake()
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import socket
+import ssl
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from host_limiter import HostLimiter, Throttled
+from resolver import Resolver
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_HEADERS = {"User-Agent": "Pinger/2.0 (+healthcheck)"}
+
+logger = logging.getLogger(__name__)
+
+
+class _Phases:
+    """Connection phase timings (ms) of one fetch, summed over redirect hops.
+
+    connects, handshakes and reused count the trace events that actually
+    completed, so a phase that never happened is reported as None, not 0.
+    """
+
+    __slots__ = (
+        "queue_ms",
+        "dns_ms",
+        "connect_ms",
+        "tls_ms",
+        "connects",
+        "handshakes",
+        "reused",
+        "queue_started",
+        "dns_started",
+        "tcp_started",
+    )
+
+    def __init__(self) -> None:
+        self.queue_ms = 0.0
+        self.dns_ms = 0.0
+        self.connect_ms = 0.0
+        self.tls_ms = 0.0
+        self.connects = 0
+        self.handshakes = 0
+        self.reused = 0
+        self.queue_started: float | None = None
+        self.dns_started: float | None = None
+        self.tcp_started: float | None = None
+
+    def connected(self, now: float) -> None:
+        if self.tcp_started is not None:
+            self.connect_ms += (now - self.tcp_started) * 1000
+            self.connects += 1
+            self.tcp_started = None
+
+    def fill(self, result: dict, https: bool) -> None:
+        """Put connect_ms/tls_ms into a fetch result when those phases took place."""
+        if self.connects or self.reused:
+            result["connect_ms"] = round(self.connect_ms, 2)
+        if https and (self.handshakes or self.reused):
+            result["tls_ms"] = round(self.tls_ms, 2)
+
+
+# Текущий fetch; наследуется колбэками транспорта, которые создаются внутри запроса
+_PHASES: contextvars.ContextVar[_Phases | None] = contextvars.ContextVar("http_probe_phases", default=None)
+
+
+class _TimedSSLObject(ssl.SSLObject):
+    """SSLObject reporting TCP connect and TLS handshake time to the fetch that opened it."""
+
+    _tls_started: float | None = None
+    _tls_phases: _Phases | None = None
+
+    def do_handshake(self) -> None:
+        if self._tls_started is None:
+            # Первый вызов — сразу после установки TCP-соединения
+            self._tls_started = time.perf_counter()
+            self._tls_phases = _PHASES.get()
+            if self._tls_phases is not None:
+                self._tls_phases.connected(self._tls_started)
+        super().do_handshake()
+        if self._tls_phases is not None:
+            self._tls_phases.tls_ms += (time.perf_counter() - self._tls_started) * 1000
+            self._tls_phases.handshakes += 1
+            self._tls_phases = None
+
+
+async def _on_connection_queued_start(session, context, params) -> None:
+    phases = _PHASES.get()
+    if phases is not None:
+        phases.queue_started = time.perf_counter()
+
+
+async def _on_connection_queued_end(session, context, params) -> None:
+    phases = _PHASES.get()
+    if phases is not None and phases.queue_started is not None:
+        phases.queue_ms += (time.perf_counter() - phases.queue_started) * 1000
+        phases.queue_started = None
+
+
+async def _on_connection_reuseconn(session, context, params) -> None:
+    phases = _PHASES.get()
+    if phases is not None:
+        phases.reused += 1
+
+
+async def _on_connection_create_start(session, context, params) -> None:
+    phases = _PHASES.get()
+    if phases is not None:
+        phases.tcp_started = time.perf_counter()
+
+
+async def _on_dns_resolvehost_start(session, context, params) -> None:
+    phases = _PHASES.get()
+    if phases is not None:
+        phases.dns_started = time.perf_counter()
+        # Пока идёт DNS, TCP-соединение ещё не начато; не дождались ответа — connect не замерен
+        phases.tcp_started = None
+
+
+async def _on_dns_resolvehost_end(session, context, params) -> None:
+    phases = _PHASES.get()
+    if phases is not None and phases.dns_started is not None:
+        now = time.perf_counter()
+        phases.dns_ms += (now - phases.dns_started) * 1000
+        phases.dns_started = None
+        phases.tcp_started = now
+
+
+async def _on_connection_create_end(session, context, params) -> None:
+    phases = _PHASES.get()
+    if phases is not None:
+        # Для TLS-соединений connect уже учтён в _TimedSSLObject
+        phases.connected(time.perf_counter())
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_queued_start.append(_on_connection_queued_start)
+    trace.on_connection_queued_end.append(_on_connection_queued_end)
+    trace.on_connection_reuseconn.append(_on_connection_reuseconn)
+    trace.on_connection_create_start.append(_on_connection_create_start)
+    trace.on_dns_resolvehost_start.append(_on_dns_resolvehost_start)
+    trace.on_dns_resolvehost_end.append(_on_dns_resolvehost_end)
+    trace.on_connection_create_end.append(_on_connection_create_end)
+    return trace
+
+
+class _CachedResolver(AbstractResolver):
+    """aiohttp adapter so that HTTP requests use the shared resolver cache."""
+
+    def __init__(self, resolver: Resolver) -> None:
+        self._resolver = resolver
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> list[dict]:
+        addresses = await self._resolver.resolve(host)
+        return [
+            {
+                "hostname": host,
+                "host": address,
+                "port": port,
+                "family": socket.AF_INET,
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST,
+            }
+            for address in addresses
+        ]
+
+    async def close(self) -> None:
+        pass
+
+
+def empty_result() -> dict:
+    """fetch() result for a request that produced nothing."""
+    return {
+        "http_status": None,
+        "latency_ms": None,
+        "queue_ms": None,
+        "connect_ms": None,
+        "tls_ms": None,
+        "ttfb_ms": None,
+        "download_ms": None,
+        "body_bytes": None,
+        "redirects": None,
+        "peercert": None,
+    }
+
+
+class HttpProbe:
+    """Asynchronous HTTP probe backed by one shared keep-alive connection pool.
+
+    Requests to the same host go through an optional HostLimiter, and the
+    latency is measured only once the limiter has let the request through.
+    A fetch cancelled while still waiting for the limiter raises Throttled
+    instead of CancelledError, so callers can tell it from a failed request.
+    Time spent waiting for a free connection of the pool is not latency
+    either: it is reported as queue_ms and subtracted.
+
+    The body is streamed and read up to max_body_bytes (0 = headers only).
+    A fully read response returns its connection to the pool; a truncated
+    one is closed instead of downloading the rest.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float = DEFAULT_TIMEOUT,
+        pool_size: int = 100,
+        pool_per_host: int = 4,
+        keepalive_sec: float = 30.0,
+        headers: dict[str, str] | None = None,
+        resolver: Resolver | None = None,
+        capture_peercert: bool = True,
+        limiter: HostLimiter | None = None,
+        max_body_bytes: int = 65536,
+    ) -> None:
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.pool_per_host = pool_per_host
+        self.keepalive_sec = keepalive_sec
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.resolver = resolver
+        self.capture_peercert = capture_peercert
+        self.limiter = limiter
+        self.max_body_bytes = max_body_bytes
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the session lazily so that it is bound to the running loop."""
+        if self._session is None or self._session.closed:
+            context = ssl.create_default_context()
+            context.sslobject_class = _TimedSSLObject
+            connector = aiohttp.TCPConnector(
+                ssl=context,
+                limit=self.pool_size,
+                limit_per_host=self.pool_per_host,
+                keepalive_timeout=self.keepalive_sec,
+                resolver=_CachedResolver(self.resolver) if self.resolver else None,
+                use_dns_cache=self.resolver is None,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                # Считаем байты «по проводу» и не тратим CPU на распаковку ненужного тела
+                auto_decompress=False,
+                trace_configs=[_trace_config()],
+            )
+        return self._session
+
+    async def fetch(self, url: str, options: dict | None = None) -> dict:
+        """Perform GET request and return http_status, latency_ms (time to headers
+        without queue_ms, the wait for a pooled connection), body_bytes,
+        redirects and the phase timings connect_ms, tls_ms, ttfb_ms
+        (request sent -> headers) and download_ms (headers -> body read).
+        connect_ms/tls_ms are 0 when a pooled connection was reused; tls_ms is
+        None for plain HTTP. A phase that did not complete (e.g. connect after
+        a failed DNS lookup) is None.
+
+        With capture_peercert the result also carries peercert as a
+        (host, port, certificate) tuple taken from the response's TLS connection.
+        options are the site's com settings; host_concurrency, host_rate and
+        host_burst override the per-host limits, max_body_bytes the body cap.
+        """
+        result = empty_result()
+        options = options or {}
+        max_body_bytes = _int_option(options.get("max_body_bytes"), self.max_body_bytes)
+        session = self._get_session()
+        phases = _Phases()
+        token = _PHASES.set(phases)
+        admitted = False
+        try:
+            async with self._slot(url, options):
+                admitted = True
+                started = time.perf_counter()
+                async with session.get(url, allow_redirects=True) as resp:
+                    headers_at = time.perf_counter()
+                    result["http_status"] = resp.status
+                    # Ожидание свободного соединения пула — не задержка сайта
+                    total_ms = max(0.0, (headers_at - started) * 1000 - phases.queue_ms)
+                    result["latency_ms"] = int(total_ms)
+                    result["queue_ms"] = round(phases.queue_ms, 2)
+                    phases.fill(result, https=resp.url.scheme == "https")
+                    result["ttfb_ms"] = round(
+                        max(0.0, total_ms - phases.dns_ms - phases.connect_ms - phases.tls_ms), 2
+                    )
+                    result["redirects"] = len(resp.history)
+                    if self.capture_peercert and resp.url.scheme == "https":
+                        result["peercert"] = _peercert(resp)
+                    result["body_bytes"] = await _read_capped(resp, max_body_bytes)
+                    result["download_ms"] = round((time.perf_counter() - headers_at) * 1000, 2)
+        except asyncio.CancelledError:
+            if admitted or self.limiter is None:
+                raise
+            raise Throttled(url) from None
+        except Exception as exc:
+            logger.debug("HTTP probe failed for %s: %s", url, exc)
+            # Неудачная проверка: оставляем только завершившиеся фазы (например, TCP до сбоя TLS)
+            phases.fill(result, https=urlparse(url).scheme == "https")
+        finally:
+            _PHASES.reset(token)
+        return result
+
+    def _slot(self, url: str, options: dict):
+        if self.limiter is None:
+            return contextlib.nullcontext()
+        return self.limiter.slot(
+            urlparse(url).hostname,
+            concurrency=options.get("host_concurrency"),
+            rate=options.get("host_rate"),
+            burst=options.get("host_burst"),
+        )
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def _int_option(value, default: int) -> int:
+    try:
+        return max(0, int(value)) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+async def _read_capped(resp: aiohttp.ClientResponse, limit: int) -> int:
+    """Read at most limit body bytes; close the connection if the body is longer."""
+    received = 0
+    content = resp.content
+    while received < limit:
+        chunk = await content.read(min(65536, limit - received))
+        if not chunk:
+            break
+        received += len(chunk)
+    if content.at_eof():
+        # Тело прочитано целиком — соединение вернётся в пул для keep-alive
+        await resp.release()
+    else:
+        resp.close()
+    return received
+
+
+def _peercert(resp: aiohttp.ClientResponse) -> tuple[str, int, dict] | None:
+    connection = resp.connection
+    transport = connection.transport if connection is not None else None
+    if transport is None:
+        return None
+    cert = transport.get_extra_info("peercert")
+    if not cert:
+        return None
+    return resp.url.host, resp.url.port or 443, cert
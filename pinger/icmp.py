@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+_HEADER = struct.Struct("!BBHHH")
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_request(identifier: int, seq: int, payload: bytes) -> bytes:
+    header = _HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, identifier, seq)
+    return _HEADER.pack(ICMP_ECHO_REQUEST, 0, _checksum(header + payload), identifier, seq) + payload
+
+
+class _Pending:
+    __slots__ = ("address", "sent_at", "future")
+
+    def __init__(self, address: str, sent_at: float, future: asyncio.Future) -> None:
+        self.address = address
+        self.sent_at = sent_at
+        self.future = future
+
+
+class IcmpPinger:
+    """ICMP echo engine multiplexing all hosts over a single socket.
+
+    Prefers a raw socket and falls back to an unprivileged ICMP datagram
+    socket (net.ipv4.ping_group_range). Every request gets its own sequence
+    number and a reader callback matches replies back to the waiting
+    futures, so concurrent checks ping their hosts over the same socket.
+    """
+
+    def __init__(self, *, timeout: float = 3.0, payload_size: int = 32) -> None:
+        self.timeout = timeout
+        self._payload = b"PingTower".ljust(payload_size, b"\x00")
+        self._sock: socket.socket | None = None
+        self._raw = False
+        self._ident = os.getpid() & 0xFFFF
+        self._seq = 0
+        self._pending: dict[int, _Pending] = {}
+        self._unavailable = False
+
+    def _open(self) -> socket.socket | None:
+        if self._sock is not None or self._unavailable:
+            return self._sock
+        for sock_type in (socket.SOCK_RAW, socket.SOCK_DGRAM):
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+            sock.setblocking(False)
+            self._raw = sock_type == socket.SOCK_RAW
+            self._sock = sock
+            asyncio.get_running_loop().add_reader(sock.fileno(), self._on_readable)
+            return sock
+        self._unavailable = True
+        logger.warning("ICMP sockets are not permitted; ping checks are disabled")
+        return None
+
+    def _next_seq(self) -> int:
+        for _ in range(0x10000):
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in self._pending:
+                return self._seq
+        raise RuntimeError("too many ICMP requests in flight")
+
+    async def ping(self, address: str) -> float | None:
+        """Return RTT to an IPv4 address in ms (rounded to 2 digits) or None."""
+        sock = self._open()
+        if sock is None:
+            return None
+        loop = asyncio.get_running_loop()
+        seq = self._next_seq()
+        pending = _Pending(address, 0.0, loop.create_future())
+        self._pending[seq] = pending
+        try:
+            packet = _echo_request(self._ident, seq, self._payload)
+            pending.sent_at = time.perf_counter()
+            await loop.sock_sendto(sock, packet, (address, 0))
+            return await asyncio.wait_for(pending.future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            return None
+        except OSError as exc:
+            logger.debug("ICMP send to %s failed: %s", address, exc)
+            return None
+        finally:
+            self._pending.pop(seq, None)
+
+    def _on_readable(self) -> None:
+        sock = self._sock
+        if sock is None:
+            return
+        while True:
+            try:
+                data, (source, _) = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as exc:
+                logger.debug("ICMP receive failed: %s", exc)
+                return
+            received_at = time.perf_counter()
+            if self._raw:
+                # Raw-сокет отдаёт пакет вместе с IP-заголовком
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < _HEADER.size:
+                continue
+            icmp_type, _, _, identifier, seq = _HEADER.unpack_from(data)
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # В datagram-сокете идентификатор подставляет ядро и само фильтрует ответы
+            if self._raw and identifier != self._ident:
+                continue
+            pending = self._pending.get(seq)
+            if pending is None or pending.address != source or pending.future.done():
+                continue
+            pending.future.set_result(round((received_at - pending.sent_at) * 1000, 2))
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            except RuntimeError:
+                pass
+            self._sock.close()
+            self._sock = None
+        for pending in self._pending.values():
+            if not pending.future.done():
+                pending.future.cancel()
+        self._pending.clear()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+CHECK_LOGGER = "pinger.checks"
+
+
+def dumps(event: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(event, default=str).decode()
+    return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; dict messages are written as they are."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            return dumps(record.msg)
+        event = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        return dumps(event)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Событие проверки кодируется уже в потоке писателя; сам dict после логирования не меняется
+        if isinstance(record.msg, dict):
+            return record
+        return super().prepare(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _CheckFilter(logging.Filter):
+    def __init__(self, checks: bool) -> None:
+        super().__init__()
+        self.checks = checks
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (record.name == CHECK_LOGGER) == self.checks
+
+
+class LogPipeline:
+    """Moves log output off the event loop.
+
+    start() replaces the root handlers with a bounded queue handler; a
+    QueueListener thread writes per-check events as JSON lines to stdout
+    and everything else to stderr in the usual text format. When the writer
+    can't keep up, records are dropped and counted instead of blocking.
+    """
+
+    def __init__(self, *, queue_size: int = 10_000, fmt: str = logging.BASIC_FORMAT) -> None:
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.handler = _DroppingQueueHandler(self.queue)
+        self.fmt = fmt
+        self._listener: logging.handlers.QueueListener | None = None
+        self._previous: list[logging.Handler] = []
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        checks = logging.StreamHandler(sys.stdout)
+        checks.setFormatter(JsonFormatter())
+        checks.addFilter(_CheckFilter(True))
+        other = logging.StreamHandler(sys.stderr)
+        other.setFormatter(logging.Formatter(self.fmt))
+        other.addFilter(_CheckFilter(False))
+        self._listener = logging.handlers.QueueListener(self.queue, checks, other, respect_handler_level=True)
+        self._listener.start()
+
+        root = logging.getLogger()
+        self._previous = list(root.handlers)
+        for handler in self._previous:
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+
+    def stop(self) -> None:
+        """Flush queued records and restore the previous handlers."""
+        if self._listener is None:
+            return
+        root = logging.getLogger()
+        root.removeHandler(self.handler)
+        for handler in self._previous:
+            root.addHandler(handler)
+        self._listener.stop()
+        self._listener = None
+
+
+class CheckLog:
+    """Per-check event records with level and sampling controls.
+
+    A record whose state changed is logged at INFO, an unchanged one at
+    DEBUG; level drops everything below it. sample is the share of
+    unchanged records that are kept, so state changes are never sampled out.
+    """
+
+    def __init__(self, *, level: str = "DEBUG", sample: float = 1.0) -> None:
+        self.logger = logging.getLogger(CHECK_LOGGER)
+        self.logger.setLevel(getattr(logging, level.upper(), logging.DEBUG))
+        self.sample = min(1.0, max(0.0, sample))
+        self.stats = {"emitted": 0, "sampled_out": 0}
+
+    def emit(self, record: dict, *, changed: bool) -> None:
+        level = logging.INFO if changed else logging.DEBUG
+        if not self.logger.isEnabledFor(level):
+            return
+        if not changed and self.sample < 1.0 and random.random() >= self.sample:
+            self.stats["sampled_out"] += 1
+            return
+        self.stats["emitted"] += 1
+        self.logger.log(level, record)
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+
+import asyncpg
+
+from history import MetricHistory
+
+logger = logging.getLogger(__name__)
+
+SITE_LOG_COLUMNS = (
+    "site_id",
+    "url",
+    "name",
+    "traffic_light",
+    "http_status",
+    "latency_ms",
+    "ping_ms",
+    "ssl_days_left",
+    "dns_resolved",
+    "redirects",
+    "errors_last",
+    "ping_interval",
+    "dns_ms",
+    "connect_ms",
+    "tls_ms",
+    "ttfb_ms",
+    "download_ms",
+    "raw_logs",
+)
+
+_UPDATE_SITES_SQL = """
+    UPDATE sites AS s
+    SET last_ok = u.last_ok,
+        last_status = u.last_status,
+        last_rtt = u.last_rtt,
+        skip_notification = u.skip_notification,
+        last_traffic_light = u.last_traffic_light,
+        history = u.history
+    FROM unnest(
+        $1::int[], $2::bool[], $3::text[], $4::float8[], $5::bool[], $6::text[], $7::jsonb[]
+    ) AS u(id, last_ok, last_status, last_rtt, skip_notification, last_traffic_light, history)
+    WHERE s.id = u.id
+"""
+
+
+def _site_config(row) -> dict:
+    return {
+        "id": row["id"],
+        "url": row["url"],
+        "name": row["name"],
+        "com": json.loads(row["com"]) if row["com"] else {},
+        "ping_interval": int(row["ping_interval"] or 30),
+    }
+
+
+def _filtered(query: str, ids: list[int] | None, shard: tuple[int, list[int]] | None) -> tuple[str, list]:
+    conditions: list[str] = []
+    args: list = []
+    if ids is not None:
+        args.append(ids)
+        conditions.append(f"id = ANY(${len(args)}::int[])")
+    if shard is not None:
+        buckets, owned = shard
+        args.extend((buckets, owned))
+        conditions.append(f"id % ${len(args) - 1}::int = ANY(${len(args)}::int[])")
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, args
+
+
+# site_logs, созданная до появления фазовых метрик, дополняется колонками при старте
+_ADD_PHASE_COLUMNS_SQL = "ALTER TABLE site_logs " + ", ".join(
+    f"ADD COLUMN IF NOT EXISTS {column} DOUBLE PRECISION"
+    for column in ("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "download_ms")
+)
+
+
+class PostgresWriter:
+    """Pooled asyncpg access for the pinger with buffered, batched writes.
+
+    site_logs rows are written with COPY and site status updates are applied
+    as one set-based UPDATE per flush. A flush happens every flush_interval
+    seconds or as soon as flush_rows log rows are buffered.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        min_size: int = 1,
+        max_size: int = 5,
+        flush_rows: int = 500,
+        flush_interval: float = 1.0,
+        max_buffer_rows: int = 50_000,
+        history_size: int = 10,
+    ) -> None:
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_buffer_rows = max_buffer_rows
+        self.history_size = history_size
+        self.pool: asyncpg.Pool | None = None
+        self._logs: list[tuple] = []
+        self._statuses: dict[int, tuple] = {}
+        self._flush_now = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.stats = {"log_rows": 0, "status_rows": 0, "flushes": 0, "dropped_rows": 0}
+
+    async def start(self) -> None:
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+            try:
+                await self.pool.execute(_ADD_PHASE_COLUMNS_SQL)
+            except Exception as exc:  # pragma: no cover - diagnostics only
+                logger.warning("Failed to add phase columns to site_logs: %s", exc)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Последний сброс не прерывается отменой close(): буфер уже вынут из очереди
+        await asyncio.shield(self.flush())
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def fetch_sites(
+        self, ids: list[int] | None = None, shard: tuple[int, list[int]] | None = None
+    ) -> list[dict]:
+        """Fetch sites configuration, status flags and history ring.
+
+        ids limits the result to given sites, shard=(buckets, owned) to sites
+        whose id % buckets is one of the owned buckets.
+        """
+        query, args = _filtered(
+            """
+            SELECT id, url, name, com, last_traffic_light, history, ping_interval,
+                   last_ok, last_status, last_rtt, skip_notification
+            FROM sites
+            """,
+            ids,
+            shard,
+        )
+        rows = await self.pool.fetch(query, *args)
+        return [
+            {
+                **_site_config(r),
+                "last_traffic_light": r["last_traffic_light"],
+                "history": MetricHistory.from_list(json.loads(r["history"]) if r["history"] else [], self.history_size),
+                "last_ok": r["last_ok"],
+                "last_status": r["last_status"],
+                "last_rtt": r["last_rtt"],
+                "skip_notification": r["skip_notification"],
+            }
+            for r in rows
+        ]
+
+    async def fetch_site_configs(self, shard: tuple[int, list[int]] | None = None) -> list[dict]:
+        """Fetch only the user-editable config of sites, without history."""
+        query, args = _filtered("SELECT id, url, name, com, ping_interval FROM sites", None, shard)
+        rows = await self.pool.fetch(query, *args)
+        return [_site_config(r) for r in rows]
+
+    def add_log(self, record: dict, logs: dict, ping_interval: int) -> None:
+        """Buffer a raw check record for the site_logs history table."""
+        dns_resolved = logs.get("dns_resolved")
+        self._logs.append(
+            (
+                record["id"],
+                record["url"],
+                record["name"],
+                logs.get("traffic_light"),
+                logs.get("http_status"),
+                logs.get("latency_ms"),
+                logs.get("ping_ms"),
+                logs.get("ssl_days_left"),
+                bool(dns_resolved) if dns_resolved is not None else None,
+                logs.get("redirects"),
+                logs.get("errors_last"),
+                ping_interval,
+                logs.get("dns_ms"),
+                logs.get("connect_ms"),
+                logs.get("tls_ms"),
+                logs.get("ttfb_ms"),
+                logs.get("download_ms"),
+                json.dumps(record["logs"], ensure_ascii=False),
+            )
+        )
+        if len(self._logs) >= self.flush_rows:
+            self._flush_now.set()
+
+    def update_status(
+        self,
+        site_id: int,
+        *,
+        ok,
+        status,
+        rtt,
+        skip_notification,
+        traffic_light,
+        history: list[dict],
+    ) -> None:
+        """Buffer the computed status of a site; only the latest one per site is written."""
+        self._statuses[site_id] = (
+            ok,
+            None if status is None else str(status),
+            None if rtt is None else float(rtt),
+            skip_notification,
+            traffic_light,
+            json.dumps(history, ensure_ascii=False),
+        )
+
+    async def _run(self) -> None:
+        # Случайная начальная фаза: воркеры, стартовавшие одновременно, не сбрасывают буферы в унисон
+        await asyncio.sleep(random.random() * self.flush_interval)
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.pool is None or (not self._logs and not self._statuses):
+            return
+        logs, self._logs = self._logs, []
+        statuses, self._statuses = self._statuses, {}
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    if logs:
+                        await conn.copy_records_to_table("site_logs", records=logs, columns=SITE_LOG_COLUMNS)
+                    if statuses:
+                        ids = list(statuses)
+                        columns = list(zip(*statuses.values()))
+                        await conn.execute(_UPDATE_SITES_SQL, ids, *columns)
+        except asyncio.CancelledError:
+            # Транзакция откатилась — возвращаем пачку в буфер, её запишет следующий сброс
+            self._requeue(logs, statuses)
+            raise
+        except Exception as exc:  # pragma: no cover - diagnostics only
+            logger.warning("Failed to flush %d logs/%d statuses to Postgres: %s", len(logs), len(statuses), exc)
+            self._requeue(logs, statuses)
+            return
+        self.stats["log_rows"] += len(logs)
+        self.stats["status_rows"] += len(statuses)
+        self.stats["flushes"] += 1
+
+    def _requeue(self, logs: list[tuple], statuses: dict[int, tuple]) -> None:
+        """Put a failed batch back in front of newer data, dropping the oldest overflow."""
+        self._logs = logs + self._logs
+        overflow = len(self._logs) - self.max_buffer_rows
+        if overflow > 0:
+            del self._logs[:overflow]
+            self.stats["dropped_rows"] += overflow
+        for site_id, status in statuses.items():
+            self._statuses.setdefault(site_id, status)
@@ -1,46 +1,19 @@
 # -*- coding: utf-8 -*-
-import socket
-import ssl
-import datetime as dt
-import requests
+import asyncio
 from urllib.parse import urlparse
-from time import strftime
-import logging
-from ping3 import ping
+from time import perf_counter, strftime
 
-DEFAULT_TIMEOUT = 10
-DEFAULT_HEADERS = {"User-Agent": "Pinger/2.0 (+healthcheck)"}
-
-
-def fetch_cert_expiry(hostname: str, port: int = 443, timeout: int = 10) -> int | None:
-    """Возвращает количество дней до истечения сертификата, либо None при ошибке"""
-    try:
-        context = ssl.create_default_context()
-        with socket.create_connection((hostname, port), timeout=timeout) as sock:
-            with context.wrap_socket(sock, server_hostname=hostname) as ssock:
-                cert = ssock.getpeercert()
-        not_after = dt.datetime.strptime(cert["notAfter"], "%b %d %H:%M:%S %Y %Z")
-        days_left = (not_after - dt.datetime.utcnow()).days
-        return days_left
-    except Exception:
-        return None
-
-
-def check_ping(hostname: str) -> float | None:
-    """ICMP ping через ping3, возвращает RTT в мс (округлено до 2 знаков) или None"""
-    try:
-        rtt = ping(hostname, timeout=3, unit="ms")
-        if rtt is not None:
-            return round(float(rtt), 2)  # 👈 округляем
-    except Exception as e:
-        logging.warning(f"Ping error: {e}")
-    return None
+from cert_cache import CertCache
+from host_limiter import Throttled
+from http_probe import HttpProbe, empty_result
+from icmp import IcmpPinger
+from resolver import Resolver
 
 
 def traffic_light_from_history(history: list[dict], current: dict) -> str:
     """
     Определяем traffic_light на основе истории и текущей проверки.
-    history: список прошлых логов (макс 4 последних)
+    history: список прошлых логов (макс 4 последних, из MetricHistory.recent)
     current: словарь с метриками текущей проверки
     """
     http_status = current.get("http_status")
@@ -57,7 +30,7 @@ def traffic_light_from_history(history: list[dict], current: dict) -> str:
     if http_status is None:
         return "red"
     if http_status >= 500:
-        if len(last5) >= 2 and all(s and s >= 500 for s in last5[-2:]):
+        if len(last5) >= 2 and all(s and s >= 500 for s in statuses[-2:]):
             return "red"
         if sum(1 for s in statuses if s and s >= 500) > 2:
             return "red"
@@ -100,50 +73,121 @@ def traffic_light_from_history(history: list[dict], current: dict) -> str:
     return "green"
 
 
-def run_checks(url: str, history: list[dict] | None = None):
-    """Главная функция: возвращает logs-словарь"""
+async def run_checks(
+    url: str,
+    history: list[dict] | None = None,
+    *,
+    options: dict | None = None,
+    timeout: float | None = None,
+    http_probe: HttpProbe,
+    resolver: Resolver,
+    cert_cache: CertCache,
+    icmp: IcmpPinger,
+):
+    """Главная функция: возвращает logs-словарь; options — настройки сайта из com.
+
+    DNS, HTTP, SSL и ping выполняются параллельно с общим дедлайном timeout:
+    не успевшие к нему проверки отменяются, их метрики остаются None
+    (срок SSL тогда берётся из кэша сертификатов, даже устаревшего).
+    Если HTTP-запрос к дедлайну так и не пропустил лимитер хоста, в logs
+    ставится throttled=True: сайт не проверен, а не упал.
+    """
     parsed = urlparse(url)
     hostname = parsed.hostname
+    port = parsed.port or 443
+    https = parsed.scheme == "https" and bool(hostname)
+
+    # DNS: адрес берётся из общего кэша резолвера и переиспользуется ping и SSL
+    async def dns() -> tuple[str | None, float]:
+        started = perf_counter()
+        try:
+            address = (await resolver.resolve(hostname))[0]
+        except Exception:
+            address = None
+        return address, round((perf_counter() - started) * 1000, 2)
+
+    # SSL: свежий кэш отдаём сразу; устаревший обновляем сертификатом из TLS-соединения HTTP-проверки,
+    # а если его нет (захват выключен, HTTP упал) — отдельным хендшейком
+    async def ssl_days_left() -> int | None:
+        if not https:
+            return None
+        if cert_cache.is_fresh(hostname, port):
+            return cert_cache.peek(hostname, port)
+        if http_probe.capture_peercert:
+            try:
+                http = await http_task
+            except Exception:
+                http = None
+            if http and http["peercert"]:
+                cert_cache.store_peercert(*http["peercert"])
+        address, _ = await dns_task
+        if not address:
+            return cert_cache.peek(hostname, port)
+        return await cert_cache.days_left(hostname, port, address)
+
+    # Ping: общий ICMP-сокет, RTT в мс (округлено до 2 знаков)
+    async def ping() -> float | None:
+        address, _ = await dns_task
+        return await icmp.ping(address) if address else None
+
+    dns_task = asyncio.create_task(dns())
+    # HTTP резолвит имя через тот же кэш, так что параллельный запрос не дублирует DNS
+    http_task = asyncio.create_task(http_probe.fetch(url, options))
+    ssl_task = asyncio.create_task(ssl_days_left())
+    ping_task = asyncio.create_task(ping())
+    tasks = (dns_task, http_task, ssl_task, ping_task)
+    try:
+        await asyncio.wait(tasks, timeout=timeout)
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    address, dns_ms = _result(dns_task, (None, None))
+    http = _result(http_task, None) or empty_result()
+    # SSL не успел к дедлайну (ждал HTTP или хендшейк) — берём последний известный срок сертификата
+    if _finished(ssl_task):
+        ssl_days = ssl_task.result()
+    else:
+        ssl_days = cert_cache.peek(hostname, port) if https else None
+    throttled = http_task.done() and not http_task.cancelled() and isinstance(http_task.exception(), Throttled)
+
+    current_metrics = {
+        "http_status": http["http_status"],
+        "latency_ms": http["latency_ms"],
+        "queue_ms": http["queue_ms"],
+        "connect_ms": http["connect_ms"],
+        "tls_ms": http["tls_ms"],
+        "ttfb_ms": http["ttfb_ms"],
+        "download_ms": http["download_ms"],
+        "body_bytes": http["body_bytes"],
+        "ping_ms": _result(ping_task, None),
+        "ssl_days_left": ssl_days,
+        "dns_resolved": address is not None,
+        "dns_ms": dns_ms,
+        "redirects": http["redirects"],
+    }
 
-    http_status = None
-    latency_ms = None
-    redirects = None
-    ssl_days_left = None
-    dns_resolved = False
-    ping_ms = None
+    logs = build_logs(current_metrics, history)
+    if throttled:
+        logs["throttled"] = True
+    return logs
 
-    # DNS
-    try:
-        socket.gethostbyname(hostname)
-        dns_resolved = True
-    except Exception:
-        dns_resolved = False
 
-    # HTTP
-    try:
-        resp = requests.get(url, headers=DEFAULT_HEADERS, timeout=DEFAULT_TIMEOUT, allow_redirects=True)
-        http_status = resp.status_code
-        latency_ms = int(resp.elapsed.total_seconds() * 1000)
-        redirects = len(resp.history)
-    except Exception:
-        http_status = None
+def _finished(task: asyncio.Task) -> bool:
+    """Проверка завершилась сама, а не отменена по дедлайну и не упала"""
+    return task.done() and not task.cancelled() and task.exception() is None
 
-    # SSL
-    if parsed.scheme == "https":
-        ssl_days_left = fetch_cert_expiry(hostname)
 
-    # Ping
-    ping_ms = check_ping(hostname)
+def _result(task: asyncio.Task, default):
+    """Результат завершившейся проверки или default, если она отменена или упала"""
+    return task.result() if _finished(task) else default
 
-    current_metrics = {
-        "http_status": http_status,
-        "latency_ms": latency_ms,
-        "ping_ms": ping_ms,
-        "ssl_days_left": ssl_days_left,
-        "dns_resolved": dns_resolved,
-        "redirects": redirects,
-    }
 
+def build_logs(current_metrics: dict, history: list[dict] | None = None) -> dict:
+    """Собирает logs-словарь из метрик проверки и вычисляет светофор"""
     traffic = traffic_light_from_history(history or [], current_metrics)
 
     logs = {
@@ -152,3 +196,25 @@ def run_checks(url: str, history: list[dict] | None = None):
         **current_metrics,
     }
     return logs
+
+
+def failed_logs(history: list[dict] | None = None) -> dict:
+    """logs-словарь для проверки, которая не завершилась (например, отменена по таймауту)"""
+    return build_logs(
+        {
+            "http_status": None,
+            "latency_ms": None,
+            "queue_ms": None,
+            "connect_ms": None,
+            "tls_ms": None,
+            "ttfb_ms": None,
+            "download_ms": None,
+            "body_bytes": None,
+            "ping_ms": None,
+            "ssl_days_left": None,
+            "dns_resolved": False,
+            "dns_ms": None,
+            "redirects": None,
+        },
+        history,
+    )
@@ -1,17 +1,9 @@
 import asyncio
-import json
 import logging
+import os
 import sys
+import time
 from pathlib import Path
-from time import strftime
-
-import psycopg2
-from psycopg2.extras import Json
-
-try:
-    import clickhouse_connect  # type: ignore
-except ImportError:  # pragma: no cover - optional dependency
-    clickhouse_connect = None
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
@@ -21,12 +13,28 @@ if str(ROOT_DIR.parent) not in sys.path:
 
 from core.config import settings  # noqa: E402
 from broker import app, broker, pinger_exchange  # noqa: E402
-from pinger_checks import run_checks  # noqa: E402
-
-logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper(), logging.INFO),
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-)
+from adaptive import AdaptiveIntervals  # noqa: E402
+from cert_cache import CertCache  # noqa: E402
+from clickhouse_sink import ClickHouseSink  # noqa: E402
+from host_limiter import HostLimiter  # noqa: E402
+from log_pipeline import CheckLog, LogPipeline  # noqa: E402
+from http_probe import HttpProbe  # noqa: E402
+from icmp import IcmpPinger  # noqa: E402
+from pg_writer import PostgresWriter  # noqa: E402
+from resolver import Resolver  # noqa: E402
+from pinger_checks import failed_logs, run_checks  # noqa: E402
+from publisher import Publisher  # noqa: E402
+from rolling import RollingStats  # noqa: E402
+from scheduler import SiteScheduler, format_laggards, format_snapshot  # noqa: E402
+from sharding import LeaseManager, StaticPartition, default_worker_id  # noqa: E402
+from site_registry import SiteRegistry  # noqa: E402
+from supervisor import Supervisor  # noqa: E402
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.INFO), format=LOG_FORMAT)
+# Запускается в процессе, который ведёт проверки (start_monitor): поток писателя не переживает fork
+LOG_PIPELINE = LogPipeline(queue_size=settings.pinger.log_queue_size, fmt=LOG_FORMAT)
+CHECK_LOG = CheckLog(level=settings.pinger.check_log_level, sample=settings.pinger.check_log_sample)
 
 _ASYNC_MAIN_URL = settings.database.main_url or ""
 if _ASYNC_MAIN_URL.startswith("postgresql+asyncpg://"):
@@ -41,369 +49,378 @@ DATABASE_URL = (
 )
 INTERVAL = settings.pinger.interval_sec
 NOTIFY_ALWAYS = settings.pinger.notify_always
-
-CLICKHOUSE_HOST = settings.clickhouse.host
-CLICKHOUSE_PORT = settings.clickhouse.port
-CLICKHOUSE_DB = settings.clickhouse.database
-CLICKHOUSE_USER = settings.clickhouse.user
-CLICKHOUSE_PASSWORD = settings.clickhouse.password
-CLICKHOUSE_TABLE = settings.clickhouse.table
-CLICKHOUSE_ENABLED = bool(settings.clickhouse.enabled and clickhouse_connect is not None)
-CH_CLIENT = None
-
-
-def write_postgres_log(record: dict, logs: dict, ping_interval: int) -> None:
-    """Persist raw record to Postgres history table."""
-    try:
-        with psycopg2.connect(DATABASE_URL) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                        INSERT INTO site_logs (
-                            site_id, url, name, traffic_light, http_status, latency_ms,
-                            ping_ms, ssl_days_left, dns_resolved, redirects, errors_last,
-                            ping_interval, raw_logs
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        record["id"],
-                        record["url"],
-                        record["name"],
-                        logs.get("traffic_light"),
-                        logs.get("http_status"),
-                        logs.get("latency_ms"),
-                        logs.get("ping_ms"),
-                        logs.get("ssl_days_left"),
-                        bool(logs.get("dns_resolved"))
-                        if logs.get("dns_resolved") is not None
-                        else None,
-                        logs.get("redirects"),
-                        logs.get("errors_last"),
-                        ping_interval,
-                        Json(record["logs"]),
-                    ),
-                )
-                conn.commit()
-    except Exception as exc:  # pragma: no cover - diagnostics only
-        logging.warning("Failed to persist log to Postgres: %s", exc)
-
-
-def _init_clickhouse() -> None:
-    """Initialise ClickHouse client when configured."""
-    global CH_CLIENT
-    if not CLICKHOUSE_ENABLED:
-        if CLICKHOUSE_HOST and clickhouse_connect is None:
-            logging.warning("clickhouse-connect is not installed; disabling ClickHouse export")
-        return
-
-    CH_CLIENT = clickhouse_connect.get_client(
-        host=CLICKHOUSE_HOST,
-        port=CLICKHOUSE_PORT,
-        username=CLICKHOUSE_USER,
-        password=CLICKHOUSE_PASSWORD,
-        database=CLICKHOUSE_DB,
+CONCURRENCY = max(1, settings.pinger.concurrency)
+CHECK_TIMEOUT = settings.pinger.check_timeout_sec
+CHECK_CANCEL_GRACE = 1.0
+HISTORY_SNAPSHOT_SEC = settings.pinger.history_snapshot_sec
+PROCESSES = max(1, settings.pinger.processes)
+HEALTH_INTERVAL = settings.pinger.health_interval_sec
+# Пул меньше числа проверок заставляет их ждать соединения, и это ожидание съедает дедлайн
+HTTP_POOL_SIZE = max(settings.pinger.http_pool_size, CONCURRENCY)
+if HTTP_POOL_SIZE > settings.pinger.http_pool_size:
+    logging.warning(
+        "PINGER__HTTP_POOL_SIZE (%d) is less than PINGER__CONCURRENCY (%d), using %d",
+        settings.pinger.http_pool_size,
+        CONCURRENCY,
+        HTTP_POOL_SIZE,
     )
-    CH_CLIENT.command(
-        f"""
-        CREATE TABLE IF NOT EXISTS {CLICKHOUSE_TABLE} (
-            id UInt64,
-            url String,
-            name String,
-            timestamp DateTime,
-            traffic_light String,
-            http_status Nullable(Int32),
-            latency_ms Nullable(Int32),
-            ping_ms Nullable(Float64),
-            ssl_days_left Nullable(Int32),
-            dns_resolved UInt8,
-            redirects Nullable(Int32),
-            errors_last Nullable(Int32),
-            ping_interval UInt32
-        ) ENGINE = MergeTree()
-        ORDER BY (url, timestamp)
-        """
-    )
-
 
-def fetch_sites():
-    """Fetch sites configuration and status flags."""
-    with psycopg2.connect(DATABASE_URL) as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT id, url, name, com, last_traffic_light, history, ping_interval,
-                       last_ok, last_status, last_rtt, skip_notification
-                FROM sites;
-                """
-            )
-            rows = cur.fetchall()
-            return [
-                {
-                    "id": r[0],
-                    "url": r[1],
-                    "name": r[2],
-                    "com": r[3] or {},
-                    "last_traffic_light": r[4],
-                    "history": r[5] or [],
-                    "ping_interval": int(r[6] or 30),
-                    "last_ok": r[7],
-                    "last_status": r[8],
-                    "last_rtt": r[9],
-                    "skip_notification": r[10],
-                }
-                for r in rows
-            ]
-
-
-def update_site_status(
-    site_id,
-    *,
-    ok,
-    status,
-    rtt,
-    skip_notification,
-    traffic_light,
-    history,
-):
-    """Persist computed status back to Postgres."""
-    with psycopg2.connect(DATABASE_URL) as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE sites
-                SET last_ok=%s,
-                    last_status=%s,
-                    last_rtt=%s,
-                    skip_notification=%s,
-                    last_traffic_light=%s,
-                    history=%s
-                WHERE id=%s
-                """,
-                (
-                    ok,
-                    status,
-                    rtt,
-                    skip_notification,
-                    traffic_light,
-                    json.dumps(history, ensure_ascii=False),
-                    site_id,
-                ),
-            )
-            conn.commit()
-
-async def monitor_site(site, stop_event: asyncio.Event):
-    site_id = site["id"]
-    url = site["url"]
-    name = site["name"]
-    ping_interval = site["ping_interval"]
-
-    logging.info(f"▶ Запуск мониторинга {name} ({url}), интервал {ping_interval} сек")
+RESOLVER = Resolver(
+    default_ttl=settings.pinger.dns_default_ttl_sec,
+    min_ttl=settings.pinger.dns_min_ttl_sec,
+    max_ttl=settings.pinger.dns_max_ttl_sec,
+    negative_ttl=settings.pinger.dns_negative_ttl_sec,
+    timeout=settings.pinger.dns_timeout_sec,
+    nameservers=[ns.strip() for ns in settings.pinger.dns_nameservers.split(",") if ns.strip()],
+)
+HTTP_PROBE = HttpProbe(
+    timeout=settings.pinger.http_timeout_sec,
+    pool_size=HTTP_POOL_SIZE,
+    pool_per_host=settings.pinger.http_pool_per_host,
+    keepalive_sec=settings.pinger.http_keepalive_sec,
+    resolver=RESOLVER,
+    capture_peercert=settings.pinger.cert_from_http,
+    limiter=HostLimiter(
+        concurrency=settings.pinger.host_concurrency,
+        rate=settings.pinger.host_rate,
+        burst=settings.pinger.host_burst,
+        # Бюджет хоста общий на все процессы этой реплики
+        share=1 / PROCESSES,
+    ),
+    max_body_bytes=settings.pinger.http_max_body_bytes,
+)
+CERT_CACHE = CertCache(
+    refresh_sec=settings.pinger.cert_refresh_sec,
+    error_ttl=settings.pinger.cert_error_ttl_sec,
+    timeout=settings.pinger.cert_timeout_sec,
+)
+ICMP = IcmpPinger(timeout=settings.pinger.ping_timeout_sec)
+SCHEDULER = SiteScheduler(
+    spread=settings.pinger.phase_spreading,
+    jitter=settings.pinger.check_jitter,
+    policy=settings.pinger.overload_policy,
+    late_sec=settings.pinger.late_check_sec,
+    max_stretch=settings.pinger.max_interval_stretch,
+)
+ADAPTIVE = AdaptiveIntervals(
+    enabled=settings.pinger.adaptive_intervals,
+    floor_sec=settings.pinger.adaptive_floor_sec,
+    ceiling_factor=settings.pinger.adaptive_ceiling_factor,
+    stable_checks=settings.pinger.adaptive_stable_checks,
+    settle_checks=settings.pinger.adaptive_settle_checks,
+)
+PUBLISHER = Publisher(
+    broker,
+    pinger_exchange,
+    settings.rabbit.pinger_routing_key,
+    max_in_flight=settings.pinger.publish_max_in_flight,
+    batch_size=settings.pinger.publish_batch_size,
+    linger_sec=settings.pinger.publish_linger_sec,
+    queue_size=settings.pinger.publish_queue_size,
+    wire_format=settings.rabbit.wire_format,
+    user_id=settings.rabbit.login,
+    max_retries=settings.pinger.publish_max_retries,
+    retry_backoff_sec=settings.pinger.publish_retry_backoff_sec,
+)
+ROLLING = RollingStats(window=settings.pinger.errors_window, alpha=settings.pinger.latency_ewma_alpha)
+PG_WRITER = PostgresWriter(
+    DATABASE_URL,
+    min_size=settings.pinger.pg_pool_min,
+    max_size=settings.pinger.pg_pool_max,
+    flush_rows=settings.pinger.pg_flush_rows,
+    flush_interval=settings.pinger.pg_flush_interval_sec,
+    history_size=settings.pinger.history_size,
+)
+CH_SINK = ClickHouseSink(settings.clickhouse)
 
-    last_status = site.get("last_traffic_light")  # сохраним последний известный статус
 
-    while not stop_event.is_set():
-        try:
-            history = site["history"][-4:] if site["history"] else []
+def _lease_manager(worker_id: str) -> LeaseManager:
+    return LeaseManager(
+        PG_WRITER,
+        worker_id=worker_id,
+        buckets=settings.pinger.shard_buckets,
+        lease_ttl=settings.pinger.shard_lease_ttl_sec,
+        heartbeat_sec=settings.pinger.shard_heartbeat_sec,
+    )
 
-            logs = run_checks(url, history)
-            traffic_light = logs["traffic_light"]
 
-            history.append(logs)
-            history = history[-10:]
+SHARDS = _lease_manager(settings.pinger.worker_id) if settings.pinger.sharding else None
 
-            # Проверка изменений
-            changed = (last_status != traffic_light)
 
-            if NOTIFY_ALWAYS == 1:
-                skip_notification = False
-            else:
-                skip_notification = not changed
+def _forget_site(site_id: int) -> None:
+    SCHEDULER.remove(site_id)
+    ADAPTIVE.forget(site_id)
+    ROLLING.forget(site_id)
 
-            record = {
-                "id": site_id,
-                "url": url,
-                "name": name,
-                "com": {**(site["com"] or {}), "skip_notification": skip_notification},
-                "logs": logs,
-            }
 
-            # Обновляем статус в БД
-            update_site_status(site_id, traffic_light, history)
-
-            # Запоминаем новый статус
-            last_status = traffic_light
-
-            # запись в ClickHouse
-            ch_client.insert(
-                f"{CLICKHOUSE_DB}.site_logs",
-                [[
-                    site_id,
-                    url,
-                    name,
-                    datetime.strptime(logs["timestamp"], "%Y-%m-%dT%H:%M:%S"),
-                    traffic_light,
-                    logs.get("http_status"),
-                    logs.get("latency_ms"),
-                    logs.get("ping_ms"),
-                    logs.get("ssl_days_left"),
-                    1 if logs.get("dns_resolved") else 0,
-                    logs.get("redirects"),
-                    logs.get("errors_last"),
-                    ping_interval,
-                ]
-            ],
-            column_names=[
-                "id",
-                "url",
-                "name",
-                "timestamp",
-                "traffic_light",
-                "http_status",
-                "latency_ms",
-                "ping_ms",
-                "ssl_days_left",
-                "dns_resolved",
-                "redirects",
-                "errors_last",
-                "ping_interval",
-            ],
+SITE_REGISTRY = SiteRegistry(
+    PG_WRITER,
+    on_upsert=SCHEDULER.upsert,
+    on_remove=_forget_site,
+    resync_sec=settings.pinger.sites_resync_sec,
+    poll_interval=INTERVAL,
+    sharding=SHARDS,
+)
+# Очередь здоровья супервизора и номер воркера; заданы только в дочерних процессах
+HEALTH_QUEUE = None
+WORKER_INDEX = 0
+CHECKS_DONE = 0
+CHECKS_THROTTLED = 0
+
+
+def _process_result(site: dict, logs: dict) -> tuple[dict, bool]:
+    """Buffer site state for Postgres and build the outgoing record."""
+    traffic_light = logs.get("traffic_light")
+    ok = traffic_light == "green"
+    status = logs.get("http_status")
+    rtt = logs.get("latency_ms")
+
+    changed = (
+        site["last_ok"] != ok
+        or site["last_status"] != status
+        or site["last_rtt"] != rtt
+    )
+    skip_notification = False if NOTIFY_ALWAYS else not changed
+
+    com = dict(site["com"] or {})
+    com["skip_notification"] = skip_notification
+
+    record = {
+        "id": site["id"],
+        "url": site["url"],
+        "name": site["name"],
+        "com": com,
+        "logs": logs,
+    }
+
+    # Строку sites пишем только при смене состояния или раз в HISTORY_SNAPSHOT_SEC
+    now = time.monotonic()
+    snapshot_at = site.get("snapshot_at")
+    if (
+        site["last_ok"] != ok
+        or site["last_status"] != status
+        or site["last_traffic_light"] != traffic_light
+        or snapshot_at is None
+        or now - snapshot_at >= HISTORY_SNAPSHOT_SEC
+    ):
+        PG_WRITER.update_status(
+            site["id"],
+            ok=ok,
+            status=status,
+            rtt=rtt,
+            skip_notification=skip_notification,
+            traffic_light=traffic_light,
+            history=site["history"].to_list(),
         )
-    except Exception as exc:  # pragma: no cover - diagnostics only
-        logging.warning("Failed to write ClickHouse row: %s", exc)
+        site["snapshot_at"] = now
+    site.update(last_ok=ok, last_status=status, last_rtt=rtt, last_traffic_light=traffic_light)
 
+    CHECK_LOG.emit(record, changed=changed)
 
-async def monitor():
-    """Run monitoring loop publishing updates to RabbitMQ."""
-    while True:
-        sites = fetch_sites()
-        logging.info("Загружено %d сервисов для проверки", len(sites))
+    PG_WRITER.add_log(record, logs, site["ping_interval"])
+    return record, skip_notification
 
-        for site in sites:
-            history = list(site["history"] or [])
-            short_history = history[-4:]
 
-            logs = run_checks(site["url"], short_history)
-            traffic_light = logs.get("traffic_light")
-            http_status = logs.get("http_status")
-            latency_ms = logs.get("latency_ms")
+async def _publish(record: dict, skip_notification: bool) -> None:
+    if skip_notification:
+        logging.info("[→] Пропускаем уведомление для %s (изменений нет)", record["url"])
+        return
+    await PUBLISHER.put(record)
 
-            history.append(logs)
-            history = history[-10:]
 
-            ok = traffic_light == "green"
-            status = http_status
-            rtt = latency_ms
+async def check_site(site: dict) -> tuple[dict, dict]:
+    """Run checks for a site within CHECK_TIMEOUT, keeping whatever finished in time."""
+    recent = site["history"].recent(4)
+    try:
+        # run_checks сам укладывается в дедлайн; внешний таймаут — страховка с запасом на отмену
+        logs = await asyncio.wait_for(
+            run_checks(
+                site["url"],
+                recent,
+                options=site["com"],
+                timeout=CHECK_TIMEOUT,
+                http_probe=HTTP_PROBE,
+                resolver=RESOLVER,
+                cert_cache=CERT_CACHE,
+                icmp=ICMP,
+            ),
+            timeout=CHECK_TIMEOUT + CHECK_CANCEL_GRACE,
+        )
+    except asyncio.TimeoutError:
+        logging.warning("[⏱] Проверка %s отменена по таймауту %s сек", site["url"], CHECK_TIMEOUT)
+        logs = failed_logs(recent)
+    return site, logs
 
-            changed = (
-                site["last_ok"] != ok
-                or site["last_status"] != status
-                or site["last_rtt"] != rtt
-            )
-            skip_notification = False if NOTIFY_ALWAYS else not changed
 
-            com = dict(site["com"] or {})
-            com["skip_notification"] = skip_notification
+def _owned(site: dict) -> bool:
+    return SHARDS is None or SHARDS.owns(site["id"])
 
-            record = {
-                "id": site["id"],
-                "url": site["url"],
-                "name": site["name"],
-                "com": com,
-                "logs": logs,
-            }
 
-            update_site_status(
-                site["id"],
-                ok=ok,
-                status=status,
-                rtt=rtt,
-                skip_notification=skip_notification,
-                traffic_light=traffic_light,
-                history=history,
-            )
+async def _handle_result(site: dict, logs: dict) -> None:
+    global CHECKS_THROTTLED
+    if not _owned(site):
+        # Бакет ушёл другому воркеру, пока шла проверка — результат публикует уже он
+        return
+    if logs.get("throttled"):
+        # Лимитер хоста не пустил запрос до дедлайна: сайт не проверен, а не упал — ждём следующего интервала
+        CHECKS_THROTTLED += 1
+        logging.info("[⏳] Проверка %s отложена: исчерпан бюджет запросов к хосту", site["url"])
+        return
+    lag = SCHEDULER.lag(site["id"])
+    logs["schedule_lag_ms"] = None if lag is None else round(lag * 1000, 1)
+    logs.update(ROLLING.observe(site, logs))
+    site["history"].append(logs)
+    SCHEDULER.set_interval(site["id"], ADAPTIVE.observe(site, logs.get("traffic_light")))
+    record, skip_notification = _process_result(site, logs)
+    CH_SINK.put(record, logs, site["ping_interval"])
+    await _publish(record, skip_notification)
 
-            print(json.dumps(record, ensure_ascii=False), flush=True)
 
-            if CLICKHOUSE_ENABLED:
-                write_clickhouse(record, logs, site["ping_interval"])
+async def _check_worker(queue: asyncio.Queue, results: asyncio.Queue) -> None:
+    while True:
+        site = await queue.get()
+        if not _owned(site) or not SCHEDULER.start(site["id"]):
+            SCHEDULER.complete(site["id"])
+            continue
+        try:
+            await results.put(await check_site(site))
+        except Exception as e:
+            logging.error(f"[!] Ошибка мониторинга сайта {site['name']}: {e}")
+            SCHEDULER.complete(site["id"])
 
-            write_postgres_log(record, logs, site["ping_interval"])
 
-            if skip_notification:
-                logging.info(
-                    "[→] Пропускаем уведомление для %s (изменений нет)",
-                    site["url"],
-                )
-                continue
+async def _collect_results(results: asyncio.Queue) -> None:
+    """Feed finished checks to the Postgres/ClickHouse/RabbitMQ writers."""
+    global CHECKS_DONE
+    while True:
+        site, logs = await results.get()
+        CHECKS_DONE += 1
+        try:
+            await _handle_result(site, logs)
+        except Exception as e:
+            logging.error(f"[!] Ошибка сохранения результата {site['name']}: {e}")
+        finally:
+            SCHEDULER.complete(site["id"])
 
-            try:
-                await broker.publish(
-                    record,
-                    exchange=pinger_exchange,
-                    routing_key="pinger.group",
-                )
-                logging.info(f"[✓] ID={site_id} отправлен в RMQ")
-            else:
-                logging.info(f"[→] Пропуск публикации ID={site_id} (skip_notification=True)")
 
-        except Exception as e:
-            logging.error(f"[!] Ошибка мониторинга сайта {name}: {e}")
+async def _report_health() -> None:
+    """Periodically send this worker's counters to the supervisor."""
+    while True:
+        HEALTH_QUEUE.put(
+            {
+                "worker": WORKER_INDEX,
+                "pid": os.getpid(),
+                "sites": len(SCHEDULER),
+                "checks": CHECKS_DONE,
+                "throttled": CHECKS_THROTTLED,
+                "postgres": dict(PG_WRITER.stats),
+                "clickhouse": dict(CH_SINK.stats),
+                "rabbit": dict(PUBLISHER.stats),
+                "logs": {**CHECK_LOG.stats, "dropped": LOG_PIPELINE.dropped},
+                "schedule": SCHEDULER.stats.snapshot(),
+                "buckets": sorted(SITE_REGISTRY.sharding.owned) if SITE_REGISTRY.sharding is not None else None,
+            }
+        )
+        await asyncio.sleep(HEALTH_INTERVAL)
 
-        try:
-            await asyncio.wait_for(stop_event.wait(), timeout=ping_interval)
-        except asyncio.TimeoutError:
-            pass
 
-    logging.info(f"⏹ Мониторинг остановлен для {name} ({url})")
+async def _watch_schedule() -> None:
+    """Log schedule lag every HEALTH_INTERVAL, with the sites most often late, and warn on overruns."""
+    stats = SCHEDULER.stats
+    overruns, skipped = stats.overruns, stats.skipped
+    while True:
+        await asyncio.sleep(HEALTH_INTERVAL)
+        if stats.overruns > overruns:
+            logging.warning(
+                "[⏱] Пингер не успевает: %d проверок опоздали на интервал и больше, пропущено %d "
+                "(политика %s, растяжение x%.2f, макс. опоздание %.1f сек)",
+                stats.overruns - overruns,
+                stats.skipped - skipped,
+                SCHEDULER.policy,
+                SCHEDULER.stretch,
+                stats.max_lag,
+            )
+        overruns, skipped = stats.overruns, stats.skipped
+        laggards = SCHEDULER.laggards()
+        if laggards:
+            logging.info("[⏱] Чаще всего опаздывают (поздних/всего): %s", format_laggards(laggards))
+        if HEALTH_QUEUE is None:
+            # В многопроцессном режиме сводку по всем воркерам пишет супервизор
+            logging.info("[⏱] Расписание: %s", format_snapshot(stats.snapshot()))
 
 
-async def site_manager():
-    """Менеджер: следит за актуальным списком сайтов"""
-    running_tasks: dict[int, dict] = {}
+async def monitor():
+    """Run monitoring loop publishing updates to RabbitMQ."""
+    checks: asyncio.Queue = asyncio.Queue(maxsize=CONCURRENCY)
+    results: asyncio.Queue = asyncio.Queue(maxsize=CONCURRENCY * 2)
+    tasks = [
+        *([asyncio.create_task(SHARDS.run())] if SHARDS is not None else []),
+        asyncio.create_task(SITE_REGISTRY.run()),
+        asyncio.create_task(SCHEDULER.run(checks)),
+        asyncio.create_task(_watch_schedule()),
+        asyncio.create_task(_collect_results(results)),
+        *(asyncio.create_task(_check_worker(checks, results)) for _ in range(CONCURRENCY)),
+        *([asyncio.create_task(_report_health())] if HEALTH_QUEUE is not None else []),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
 
-    while True:
-        sites = fetch_sites()
-
-        for site_id, site in sites.items():
-            existing = running_tasks.get(site_id)
-
-            if existing:
-                if existing["ping_interval"] != site["ping_interval"]:
-                    logging.info(f"[↻] Перезапуск сайта {site['name']} (новый интервал)")
-                    existing["stop_event"].set()
-                    existing["task"].cancel()
-
-                    stop_event = asyncio.Event()
-                    task = asyncio.create_task(monitor_site(site, stop_event))
-                    running_tasks[site_id] = {
-                        "task": task,
-                        "stop_event": stop_event,
-                        "ping_interval": site["ping_interval"],
-                    }
-            else:
-                stop_event = asyncio.Event()
-                task = asyncio.create_task(monitor_site(site, stop_event))
-                running_tasks[site_id] = {
-                    "task": task,
-                    "stop_event": stop_event,
-                    "ping_interval": site["ping_interval"],
-                }
-
-        for site_id in list(running_tasks.keys()):
-            if site_id not in sites:
-                logging.info(f"[-] Сайт {site_id} удалён из БД — останавливаю таску")
-                running_tasks[site_id]["stop_event"].set()
-                running_tasks[site_id]["task"].cancel()
-                del running_tasks[site_id]
-
-        await asyncio.sleep(1)
 
 @app.after_startup
 async def start_monitor():
-    _init_clickhouse()
+    LOG_PIPELINE.start()
+    await PG_WRITER.start()
+    if SHARDS is not None:
+        await SHARDS.setup()
+    try:
+        await CH_SINK.start()
+    except Exception as exc:  # pragma: no cover - diagnostics only
+        logging.warning("ClickHouse is unavailable, export disabled: %s", exc)
+    PUBLISHER.start()
     asyncio.create_task(monitor())
 
 
-if __name__ == "__main__":
+@app.on_shutdown
+async def stop_monitor():
+    await PUBLISHER.close()
+    await HTTP_PROBE.close()
+    ICMP.close()
+    if SHARDS is not None:
+        await SHARDS.release()
+    await PG_WRITER.close()
+    await CH_SINK.close()
+    LOG_PIPELINE.stop()
+
+
+def _setup_worker(index: int, count: int, health) -> None:
+    """Per-process state of worker index of count; must run in the forked child."""
+    global HEALTH_QUEUE, WORKER_INDEX, SHARDS, ICMP
+    HEALTH_QUEUE = health
+    WORKER_INDEX = index
+    # Объекты модуля созданы ещё в супервизоре: всё, что зависит от pid, пересоздаём после fork,
+    # иначе воркеры делят один worker_id (а с ним лизы и все сайты) и один ICMP-идентификатор
+    ICMP = IcmpPinger(timeout=settings.pinger.ping_timeout_sec)
+    if SHARDS is not None:
+        # С арендой бакетов каждый процесс — отдельный воркер со своим id
+        base = settings.pinger.worker_id
+        SHARDS = _lease_manager(f"{base}-{index}" if base else default_worker_id())
+        SITE_REGISTRY.set_sharding(SHARDS)
+    else:
+        # Без аренды делим сайты между процессами по id
+        SITE_REGISTRY.set_sharding(StaticPartition(index, count))
+
+
+def _run_worker(index: int, count: int, health) -> None:
+    """Entry point of a forked worker: its own event loop over its part of the sites."""
+    _setup_worker(index, count, health)
     asyncio.run(app.run())
+
+
+if __name__ == "__main__":
+    if PROCESSES > 1:
+        Supervisor(_run_worker, PROCESSES, health_interval=HEALTH_INTERVAL).run()
+    else:
+        asyncio.run(app.run())
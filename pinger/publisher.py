@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+
+from faststream.rabbit import RabbitBroker, RabbitExchange
+
+from core.messages import check_wire_format, encode, pack_batch
+
+logger = logging.getLogger(__name__)
+
+
+class Publisher:
+    """Pipelined RabbitMQ publisher for pinger events.
+
+    put() only enqueues; a background task keeps up to max_in_flight
+    publishes waiting for their broker confirms at once instead of one
+    round-trip per event. With batch_size > 1 events that arrive within
+    linger_sec of each other are packed into one core.messages batch
+    envelope. Bodies are encoded in wire_format (see core.messages) and
+    msgpack ones are stamped with user_id, the broker login. When
+    the queue is full put() waits, slowing the collector down rather than
+    growing memory.
+
+    A failed publish is retried max_retries times with exponential backoff
+    before its events are dropped. Events of one site are published in
+    order: a batch waits for the in-flight publishes that carry any of its
+    sites.
+    """
+
+    def __init__(
+        self,
+        broker: RabbitBroker,
+        exchange: RabbitExchange,
+        routing_key: str,
+        *,
+        max_in_flight: int = 256,
+        batch_size: int = 1,
+        linger_sec: float = 0.05,
+        queue_size: int = 10_000,
+        wire_format: str = "json",
+        user_id: str = "",
+        max_retries: int = 5,
+        retry_backoff_sec: float = 0.5,
+    ) -> None:
+        check_wire_format(wire_format)
+        self.broker = broker
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.batch_size = max(1, batch_size)
+        self.linger_sec = linger_sec
+        self.wire_format = wire_format
+        self.user_id = user_id
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff_sec = retry_backoff_sec
+        self.stats = {"events": 0, "messages": 0, "retries": 0, "failed_events": 0}
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=max(1, queue_size))
+        self._window = asyncio.Semaphore(max(1, max_in_flight))
+        self._in_flight: set[asyncio.Task] = set()
+        # Принятые put(), но ещё не отправленные и не отброшенные события
+        self._pending = 0
+        # Сайт -> последняя публикация в полёте с его событием
+        self._site_tasks: dict[int, asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, record: dict) -> None:
+        await self._queue.put(record)
+        self._pending += 1
+
+    async def _next_batch(self) -> list[dict]:
+        batch = [await self._queue.get()]
+        if self.batch_size == 1:
+            return batch
+        deadline = asyncio.get_running_loop().time() + self.linger_sec
+        while len(batch) < self.batch_size:
+            if self._queue.empty():
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            # Более раннее событие того же сайта должно быть подтверждено раньше этого
+            earlier = {self._site_tasks[r["id"]] for r in batch if r["id"] in self._site_tasks}
+            if earlier:
+                await asyncio.wait(earlier)
+            # Окно ограничивает число публикаций, ждущих подтверждения брокера
+            await self._window.acquire()
+            task = asyncio.create_task(self._send(batch))
+            self._in_flight.add(task)
+            for record in batch:
+                self._site_tasks[record["id"]] = task
+            task.add_done_callback(functools.partial(self._done, batch))
+
+    def _done(self, batch: list[dict], task: asyncio.Task) -> None:
+        self._in_flight.discard(task)
+        for record in batch:
+            if self._site_tasks.get(record["id"]) is task:
+                del self._site_tasks[record["id"]]
+
+    async def _send(self, batch: list[dict]) -> None:
+        try:
+            if await self._publish(batch):
+                self.stats["events"] += len(batch)
+                self.stats["messages"] += 1
+                logger.info("[✓] %d событий отправлено в RMQ (ID=%s)", len(batch), ",".join(str(r["id"]) for r in batch[:10]))
+            else:
+                self.stats["failed_events"] += len(batch)
+        finally:
+            self._pending -= len(batch)
+            for _ in batch:
+                self._queue.task_done()
+            self._window.release()
+
+    async def _publish(self, batch: list[dict]) -> bool:
+        delay = self.retry_backoff_sec
+        for attempt in range(self.max_retries + 1):
+            try:
+                body, options = encode(batch[0] if len(batch) == 1 else pack_batch(batch), self.wire_format, self.user_id)
+                await self.broker.publish(body, exchange=self.exchange, routing_key=self.routing_key, **options)
+                return True
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    logger.error(
+                        "[!] Не удалось отправить в RMQ %d событий (ID=%s) за %d попыток: %s",
+                        len(batch),
+                        batch[0]["id"],
+                        attempt + 1,
+                        exc,
+                    )
+                    return False
+                logger.warning("RMQ publish failed (attempt %d), retrying in %.1fs: %s", attempt + 1, delay, exc)
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+        return False
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Publish what is queued (up to timeout) and stop."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("RMQ publisher closed with %d events unsent", self._pending)
+        self._task.cancel()
+        for task in list(self._in_flight):
+            task.cancel()
+        await asyncio.gather(self._task, *self._in_flight, return_exceptions=True)
+        self._task = None
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+
+try:
+    import aiodns  # type: ignore
+    import pycares  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    aiodns = None
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ("addresses", "error", "expires")
+
+    def __init__(self, addresses: list[str], error: str | None, expires: float) -> None:
+        self.addresses = addresses
+        self.error = error
+        self.expires = expires
+
+
+class Resolver:
+    """Asynchronous IPv4 resolver with a TTL-respecting positive and negative cache.
+
+    With aiodns installed the record TTL comes from the DNS answer itself;
+    otherwise the loop's getaddrinfo is used and default_ttl applies.
+    nameservers ("host" or "host:port") override /etc/resolv.conf for aiodns.
+    Concurrent lookups of the same name share a single query.
+    """
+
+    def __init__(
+        self,
+        *,
+        default_ttl: float = 60.0,
+        min_ttl: float = 5.0,
+        max_ttl: float = 3600.0,
+        negative_ttl: float = 30.0,
+        timeout: float = 5.0,
+        max_entries: int = 100_000,
+        nameservers: list[str] | None = None,
+    ) -> None:
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.nameservers = nameservers or None
+        self._cache: dict[str, _CacheEntry] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._dns = None
+
+    def _get_dns(self):
+        if self._dns is None and aiodns is not None:
+            self._dns = aiodns.DNSResolver(nameservers=self.nameservers, timeout=self.timeout)
+        return self._dns
+
+    async def resolve(self, host: str) -> list[str]:
+        """Return IPv4 addresses of host, raising socket.gaierror when it does not resolve."""
+        if not host:
+            raise socket.gaierror(socket.EAI_NONAME, "empty hostname")
+        try:
+            return [str(ipaddress.IPv4Address(host))]
+        except ValueError:
+            pass
+
+        host = host.lower()
+        entry = self._cache.get(host)
+        if entry is None or entry.expires <= time.monotonic():
+            task = self._inflight.get(host)
+            if task is None:
+                task = asyncio.create_task(self._refresh(host))
+                self._inflight[host] = task
+                task.add_done_callback(lambda _, host=host: self._inflight.pop(host, None))
+            # shield: отмена одного ожидающего не должна отменять общий запрос
+            entry = await asyncio.shield(task)
+
+        if entry.error is not None:
+            raise socket.gaierror(socket.EAI_NONAME, entry.error)
+        return entry.addresses
+
+    async def _refresh(self, host: str) -> _CacheEntry:
+        try:
+            addresses, ttl = await asyncio.wait_for(self._lookup(host), timeout=self.timeout)
+            ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+            entry = _CacheEntry(addresses, None, time.monotonic() + ttl)
+        except Exception as exc:
+            logger.debug("DNS lookup failed for %s: %s", host, exc)
+            error = getattr(exc, "strerror", None) or str(exc) or exc.__class__.__name__
+            entry = _CacheEntry([], error, time.monotonic() + self.negative_ttl)
+        self._store(host, entry)
+        return entry
+
+    async def _lookup(self, host: str) -> tuple[list[str], float]:
+        dns = self._get_dns()
+        if dns is not None:
+            try:
+                result = await dns.query_dns(host, "A")
+                addresses = [record.data.addr for record in result.answer if record.type == pycares.QUERY_TYPE_A]
+                if addresses:
+                    # В ответе бывает и цепочка CNAME: кэшируем не дольше самой короткой записи
+                    return list(dict.fromkeys(addresses)), float(min(record.ttl for record in result.answer))
+            except aiodns.error.DNSError:
+                # Имена из /etc/hosts c-ares через query не видит — пробуем системный резолвер
+                pass
+
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, f"no addresses for {host}")
+        return addresses, self.default_ttl
+
+    def _store(self, host: str, entry: _CacheEntry) -> None:
+        cache = self._cache
+        cache.pop(host, None)
+        cache[host] = entry
+        if len(cache) <= self.max_entries:
+            return
+        now = time.monotonic()
+        for key in [key for key, value in cache.items() if value.expires <= now]:
+            del cache[key]
+        while len(cache) > self.max_entries:
+            del cache[next(iter(cache))]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+
+def is_failure(logs: dict) -> bool:
+    """A check failed if there was no HTTP response, a 5xx or no DNS answer."""
+    status = logs.get("http_status")
+    return status is None or status >= 500 or not logs.get("dns_resolved")
+
+
+class _SiteStats:
+    __slots__ = ("ring", "pos", "size", "errors", "streak", "ewma")
+
+    def __init__(self, window: int) -> None:
+        self.ring = bytearray(window)
+        self.pos = 0
+        self.size = 0
+        self.errors = 0
+        self.streak = 0
+        self.ewma: float | None = None
+
+
+class RollingStats:
+    """Per-site rolling counters updated in O(1) per check.
+
+    Keeps the number of failures over the last window checks (a bytearray
+    ring plus a running count), the current streak of consecutive failures
+    and an EWMA of latency_ms. A site's state is seeded once from its
+    MetricHistory and afterwards maintained only from new checks.
+    """
+
+    def __init__(self, *, window: int = 10, alpha: float = 0.3) -> None:
+        self.window = max(1, window)
+        self.alpha = min(1.0, max(0.0, alpha)) or 1.0
+        self._sites: dict[int, _SiteStats] = {}
+
+    def _push(self, stats: _SiteStats, logs: dict) -> None:
+        failed = 1 if is_failure(logs) else 0
+        # Из окна выпадает самая старая проверка — вычитаем её и кладём новую на её место
+        if stats.size == self.window:
+            stats.errors -= stats.ring[stats.pos]
+        else:
+            stats.size += 1
+        stats.ring[stats.pos] = failed
+        stats.errors += failed
+        stats.pos = (stats.pos + 1) % self.window
+        stats.streak = stats.streak + 1 if failed else 0
+
+        latency = logs.get("latency_ms")
+        if latency is not None:
+            stats.ewma = latency if stats.ewma is None else stats.ewma + self.alpha * (latency - stats.ewma)
+
+    def observe(self, site: dict, logs: dict) -> dict:
+        """Account a check and return errors_last, fail_streak and latency_ewma_ms."""
+        stats = self._sites.get(site["id"])
+        if stats is None:
+            stats = self._sites[site["id"]] = _SiteStats(self.window)
+            history = site.get("history")
+            for entry in history.recent(self.window) if history is not None else ():
+                self._push(stats, entry)
+        self._push(stats, logs)
+        return {
+            "errors_last": stats.errors,
+            "fail_streak": stats.streak,
+            "latency_ewma_ms": round(stats.ewma, 2) if stats.ewma is not None else None,
+        }
+
+    def forget(self, site_id: int) -> None:
+        self._sites.pop(site_id, None)
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import time
+
+# Поля сайта, которые приходят из БД; всё остальное (history, last_*) ведёт сам пингер
+CONFIG_FIELDS = ("url", "name", "com", "ping_interval")
+OVERLOAD_POLICIES = ("none", "skip_oldest", "stretch", "protect_critical")
+# Верхние границы корзин гистограммы опоздания проверок, сек
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+
+def _interval(site: dict) -> float:
+    return max(1.0, float(site["ping_interval"]))
+
+
+def _critical(site: dict) -> bool:
+    return bool((site.get("com") or {}).get("critical"))
+
+
+def phase(site_id: int) -> float:
+    """Deterministic offset of a site within its interval, as a fraction in [0, 1).
+
+    Fibonacci hashing spreads consecutive ids evenly over the interval.
+    """
+    return ((site_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) / 2**64
+
+
+class ScheduleStats:
+    """Counters of how late checks start relative to their due time.
+
+    late counts checks that started more than late_sec after due, overruns
+    those that missed a whole interval, skipped those shed by the overload
+    policy. lag_histogram counts all checks by LAG_BUCKETS.
+    """
+
+    def __init__(self) -> None:
+        self.checks = 0
+        self.late = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.max_lag = 0.0
+        self.lag_histogram = [0] * len(LAG_BUCKETS)
+
+    def observe(self, lag: float, *, late: bool, overrun: bool) -> None:
+        self.checks += 1
+        self.late += late
+        self.overruns += overrun
+        self.max_lag = max(self.max_lag, lag)
+        for index, bound in enumerate(LAG_BUCKETS):
+            if lag <= bound:
+                self.lag_histogram[index] += 1
+                break
+
+    def snapshot(self) -> dict:
+        return {
+            "checks": self.checks,
+            "late": self.late,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "max_lag_sec": round(self.max_lag, 3),
+            "lag_histogram": {
+                f"le_{bound:g}" if bound != math.inf else "inf": count
+                for bound, count in zip(LAG_BUCKETS, self.lag_histogram)
+            },
+        }
+
+
+def merge_snapshots(snapshots: list[dict]) -> dict:
+    """Sum ScheduleStats snapshots of several workers into one."""
+    merged = ScheduleStats().snapshot()
+    for snapshot in snapshots:
+        for name in ("checks", "late", "overruns", "skipped"):
+            merged[name] += snapshot.get(name, 0)
+        merged["max_lag_sec"] = max(merged["max_lag_sec"], snapshot.get("max_lag_sec", 0.0))
+        for bucket, count in (snapshot.get("lag_histogram") or {}).items():
+            merged["lag_histogram"][bucket] = merged["lag_histogram"].get(bucket, 0) + count
+    return merged
+
+
+def format_laggards(laggards: list[dict]) -> str:
+    """Log line for SiteScheduler.laggards()."""
+    return ", ".join(
+        f"{site['url']} {site['late']}/{site['checks']} (last {site['lag_sec']:.1f}s, max {site['max_lag_sec']:.1f}s)"
+        for site in laggards
+    )
+
+
+def format_snapshot(snapshot: dict) -> str:
+    """Log line for a ScheduleStats snapshot, lag histogram included."""
+    histogram = " ".join(f"{bucket}={count}" for bucket, count in snapshot["lag_histogram"].items())
+    return (
+        f"late {snapshot['late']}/{snapshot['checks']}, overruns {snapshot['overruns']}, "
+        f"skipped {snapshot['skipped']}, max lag {snapshot['max_lag_sec']:.3f}s, lag histogram: {histogram}"
+    )
+
+
+class _Entry:
+    __slots__ = (
+        "site",
+        "due",
+        "dispatch_at",
+        "interval",
+        "base_interval",
+        "version",
+        "in_flight",
+        "checks",
+        "late",
+        "lag",
+        "max_lag",
+    )
+
+    def __init__(self, site: dict, due: float) -> None:
+        self.site = site
+        self.due = due
+        self.dispatch_at = due
+        # interval — текущий (может меняться адаптивной политикой), base_interval — из настроек сайта
+        self.base_interval = self.interval = _interval(site)
+        self.version = 0
+        self.in_flight = False
+        # Опоздание проверок этого сайта: число начатых, из них поздних, последнее и максимальное, сек
+        self.checks = 0
+        self.late = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+
+class SiteScheduler:
+    """Min-heap of per-site due times dispatching only the sites that are due.
+
+    With spread enabled every site is checked on its own grid, shifted by
+    phase(site_id) * interval, so sites with the same interval never fire
+    together after a restart or an overrun. jitter adds a random delay of up
+    to jitter * interval to each dispatch without moving the grid.
+
+    start() measures each check's lag behind its dispatch time, per site
+    (lag(), laggards()) and in stats, and applies the overload policy:
+      none              only count late checks;
+      skip_oldest       drop checks that are a whole interval late, the site
+                        waits for its next slot;
+      stretch           lengthen all intervals by a factor that follows the
+                        average lag (at most max_stretch);
+      protect_critical  dispatch sites with com.critical first and drop only
+                        non-critical checks that are a whole interval late.
+    """
+
+    def __init__(
+        self,
+        clock=time.monotonic,
+        *,
+        spread: bool = True,
+        jitter: float = 0.0,
+        policy: str = "none",
+        late_sec: float = 1.0,
+        max_stretch: float = 4.0,
+    ) -> None:
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy {policy!r}, expected one of {', '.join(OVERLOAD_POLICIES)}")
+        self._clock = clock
+        self.spread = spread
+        self.jitter = jitter
+        self.policy = policy
+        self.late_sec = late_sec
+        self.max_stretch = max(1.0, max_stretch)
+        self.stretch = 1.0
+        self.stats = ScheduleStats()
+        self._load = 0.0
+        self._entries: dict[int, _Entry] = {}
+        self._heap: list[tuple[float, int, int, int]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, site_id: int) -> bool:
+        return site_id in self._entries
+
+    def get(self, site_id: int) -> dict | None:
+        entry = self._entries.get(site_id)
+        return entry.site if entry else None
+
+    def _align(self, site_id: int, interval: float, after: float) -> float:
+        """First moment on the site's phase grid not earlier than after."""
+        if not self.spread:
+            return after
+        offset = phase(site_id) * interval
+        return math.ceil((after - offset) / interval - 1e-9) * interval + offset
+
+    def _push(self, site_id: int, entry: _Entry) -> None:
+        entry.version += 1
+        at = entry.due
+        if self.jitter:
+            at += random.random() * self.jitter * entry.interval
+        entry.dispatch_at = at
+        heapq.heappush(self._heap, (at, next(self._seq), site_id, entry.version))
+        self._wakeup.set()
+
+    def upsert(self, site: dict) -> None:
+        """Add a new site or apply config changes to a scheduled one in place."""
+        site_id = site["id"]
+        entry = self._entries.get(site_id)
+        if entry is None:
+            entry = _Entry(site, 0.0)
+            entry.due = self._align(site_id, entry.interval, self._clock())
+            self._entries[site_id] = entry
+            self._push(site_id, entry)
+            return
+
+        for field in CONFIG_FIELDS:
+            entry.site[field] = site[field]
+        interval = _interval(site)
+        if interval == entry.base_interval:
+            return
+        entry.base_interval = interval
+        if entry.in_flight:
+            # Новый интервал применится в complete()
+            entry.interval = interval
+            return
+        # Переносим следующую проверку относительно предыдущей, не дожидаясь старого срока
+        last_due = entry.due - entry.interval
+        entry.interval = interval
+        entry.due = self._align(site_id, interval, max(last_due + interval, self._clock()))
+        self._push(site_id, entry)
+
+    def set_interval(self, site_id: int, interval: float) -> None:
+        """Override the interval used when the site's current check completes."""
+        entry = self._entries.get(site_id)
+        if entry is not None:
+            entry.interval = max(1.0, interval)
+
+    def remove(self, site_id: int) -> None:
+        self._entries.pop(site_id, None)
+
+    def sync(self, sites: list[dict]) -> None:
+        """Bring the schedule in line with a full list of sites."""
+        seen = set()
+        for site in sites:
+            seen.add(site["id"])
+            self.upsert(site)
+        for site_id in list(self._entries):
+            if site_id not in seen:
+                self.remove(site_id)
+
+    def pop_due(self, now: float | None = None) -> list[dict]:
+        """Return due sites and mark them as in flight."""
+        now = self._clock() if now is None else now
+        due: list[dict] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, site_id, version = heapq.heappop(self._heap)
+            entry = self._entries.get(site_id)
+            if entry is None or entry.version != version or entry.in_flight:
+                continue
+            entry.in_flight = True
+            due.append(entry.site)
+        if self.policy == "protect_critical" and len(due) > 1:
+            due.sort(key=lambda site: not _critical(site))
+        return due
+
+    def start(self, site_id: int) -> bool:
+        """Record the lag of a check about to start; False means the policy sheds it.
+
+        A shed check must still be finished with complete().
+        """
+        entry = self._entries.get(site_id)
+        if entry is None:
+            return True
+        lag = max(0.0, self._clock() - entry.dispatch_at)
+        late = lag > self.late_sec
+        overrun = lag >= entry.interval
+        self.stats.observe(lag, late=late, overrun=overrun)
+        entry.checks += 1
+        entry.late += late
+        entry.lag = lag
+        entry.max_lag = max(entry.max_lag, lag)
+        if self.policy == "stretch":
+            # Средняя доля опоздания от интервала; растянутые интервалы снижают нагрузку, пока опоздание не уйдёт
+            self._load += 0.05 * (min(lag / entry.interval, self.max_stretch) - self._load)
+            self.stretch = min(self.max_stretch, 1.0 + self._load)
+        elif overrun and (
+            self.policy == "skip_oldest" or (self.policy == "protect_critical" and not _critical(entry.site))
+        ):
+            self.stats.skipped += 1
+            return False
+        return True
+
+    def lag(self, site_id: int) -> float | None:
+        """Lag of the site's latest check behind its dispatch time, sec."""
+        entry = self._entries.get(site_id)
+        return entry.lag if entry is not None and entry.checks else None
+
+    def laggards(self, limit: int = 5) -> list[dict]:
+        """Sites whose checks most often start late, the largest late share first."""
+        late = (entry for entry in self._entries.values() if entry.late)
+        worst = heapq.nlargest(limit, late, key=lambda entry: (entry.late / entry.checks, entry.lag))
+        return [
+            {
+                "id": entry.site["id"],
+                "url": entry.site["url"],
+                "checks": entry.checks,
+                "late": entry.late,
+                "lag_sec": round(entry.lag, 3),
+                "max_lag_sec": round(entry.max_lag, 3),
+            }
+            for entry in worst
+        ]
+
+    def complete(self, site_id: int) -> None:
+        """Schedule the next check of a site once its current one is handled."""
+        entry = self._entries.get(site_id)
+        if entry is None:
+            return
+        entry.in_flight = False
+        interval = entry.interval * self.stretch if self.policy == "stretch" else entry.interval
+        # После перегрузки возвращаемся на свою фазу, а не выстраиваемся в очередь на "сейчас"
+        entry.due = self._align(site_id, interval, max(entry.due + interval, self._clock()))
+        self._push(site_id, entry)
+
+    def next_delay(self, now: float | None = None) -> float | None:
+        now = self._clock() if now is None else now
+        while self._heap:
+            due, _, site_id, version = self._heap[0]
+            entry = self._entries.get(site_id)
+            if entry is None or entry.version != version or entry.in_flight:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, due - now)
+        return None
+
+    async def run(self, queue: asyncio.Queue) -> None:
+        """Dispatch due sites into the worker queue forever."""
+        while True:
+            for site in self.pop_due():
+                await queue.put(site)
+            self._wakeup.clear()
+            delay = self.next_delay()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Callable
+
+from pg_writer import PostgresWriter
+
+logger = logging.getLogger(__name__)
+
+# Те же таблицы описаны в postgres/init/init.sql
+_SETUP_SQL = """
+    CREATE TABLE IF NOT EXISTS pinger_workers (
+        worker_id TEXT PRIMARY KEY,
+        started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE TABLE IF NOT EXISTS pinger_leases (
+        bucket INTEGER PRIMARY KEY,
+        worker_id TEXT,
+        expires_at TIMESTAMPTZ NOT NULL DEFAULT 'epoch'
+    );
+"""
+_SETUP_LOCK_KEY = 0x5175_0011
+
+_HEARTBEAT_SQL = """
+    INSERT INTO pinger_workers (worker_id) VALUES ($1)
+    ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = NOW()
+"""
+_RENEW_SQL = """
+    UPDATE pinger_leases
+    SET expires_at = NOW() + make_interval(secs => $2)
+    WHERE worker_id = $1 AND expires_at > NOW()
+    RETURNING bucket
+"""
+_RELEASE_SQL = """
+    UPDATE pinger_leases
+    SET worker_id = NULL, expires_at = 'epoch'
+    WHERE worker_id = $1 AND bucket = ANY($2::int[])
+"""
+_ACQUIRE_SQL = """
+    UPDATE pinger_leases
+    SET worker_id = $1, expires_at = NOW() + make_interval(secs => $2)
+    WHERE bucket IN (
+        SELECT bucket FROM pinger_leases
+        WHERE worker_id IS NULL OR expires_at <= NOW()
+        ORDER BY bucket
+        LIMIT $3
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING bucket
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class StaticPartition:
+    """Fixed split of sites between local worker processes: index of count."""
+
+    def __init__(self, index: int, count: int) -> None:
+        self.buckets = max(1, count)
+        self.owned = frozenset({index % self.buckets})
+        self.on_change: Callable[[], None] | None = None
+
+    def owns(self, site_id: int) -> bool:
+        return site_id % self.buckets in self.owned
+
+    def sql_filter(self) -> tuple[int, list[int]]:
+        return self.buckets, sorted(self.owned)
+
+
+class LeaseManager:
+    """Splits sites between pinger replicas through leases on hash buckets.
+
+    A site belongs to bucket id % buckets. Every worker heartbeats into
+    pinger_workers, renews its bucket leases and aims for an equal share of
+    the buckets among live workers: surplus buckets are released, free or
+    expired ones are taken with SKIP LOCKED. A worker that cannot renew in
+    time drops all of its buckets locally, so a bucket is never checked by
+    two workers at once.
+    """
+
+    def __init__(
+        self,
+        store: PostgresWriter,
+        *,
+        worker_id: str = "",
+        buckets: int = 64,
+        lease_ttl: float = 30.0,
+        heartbeat_sec: float = 10.0,
+    ) -> None:
+        self.store = store
+        self.worker_id = worker_id or default_worker_id()
+        self.buckets = max(1, buckets)
+        self.lease_ttl = lease_ttl
+        self.heartbeat_sec = min(heartbeat_sec, lease_ttl / 3)
+        self.owned: frozenset[int] = frozenset()
+        self.on_change: Callable[[], None] | None = None
+        self._valid_until = 0.0
+
+    def bucket_of(self, site_id: int) -> int:
+        return site_id % self.buckets
+
+    def owns(self, site_id: int) -> bool:
+        return site_id % self.buckets in self.owned and time.monotonic() < self._valid_until
+
+    def sql_filter(self) -> tuple[int, list[int]]:
+        """(buckets, owned) pair for PostgresWriter.fetch_sites(shard=...)."""
+        return self.buckets, sorted(self.owned)
+
+    async def setup(self) -> None:
+        async with self.store.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", _SETUP_LOCK_KEY)
+                await conn.execute(_SETUP_SQL)
+                await conn.execute(
+                    "INSERT INTO pinger_leases (bucket) SELECT generate_series(0, $1::int - 1) ON CONFLICT DO NOTHING",
+                    self.buckets,
+                )
+                await conn.execute("DELETE FROM pinger_leases WHERE bucket >= $1", self.buckets)
+
+    def _set_owned(self, owned: frozenset[int]) -> None:
+        if owned == self.owned:
+            return
+        gained, lost = len(owned - self.owned), len(self.owned - owned)
+        self.owned = owned
+        logger.info("Worker %s owns %d/%d buckets (+%d/-%d)", self.worker_id, len(owned), self.buckets, gained, lost)
+        if self.on_change is not None:
+            self.on_change()
+
+    async def tick(self) -> None:
+        """Heartbeat, renew own leases and move towards a fair share of buckets."""
+        started = time.monotonic()
+        async with self.store.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(_HEARTBEAT_SQL, self.worker_id)
+                await conn.execute(
+                    "DELETE FROM pinger_workers WHERE heartbeat_at < NOW() - make_interval(secs => $1)",
+                    self.lease_ttl,
+                )
+                live = await conn.fetchval("SELECT count(*) FROM pinger_workers")
+                owned = {row["bucket"] for row in await conn.fetch(_RENEW_SQL, self.worker_id, self.lease_ttl)}
+                target = -(-self.buckets // max(1, live))
+                if len(owned) > target:
+                    surplus = sorted(owned)[target:]
+                    await conn.execute(_RELEASE_SQL, self.worker_id, surplus)
+                    owned.difference_update(surplus)
+                elif len(owned) < target:
+                    rows = await conn.fetch(_ACQUIRE_SQL, self.worker_id, self.lease_ttl, target - len(owned))
+                    owned.update(row["bucket"] for row in rows)
+        # Лизы продлены не раньше started, поэтому локально считаем их действительными до started + ttl
+        self._valid_until = started + self.lease_ttl
+        self._set_owned(frozenset(owned))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.tick(), timeout=self.heartbeat_sec)
+            except Exception as exc:
+                logger.error("[!] Не удалось продлить аренду бакетов: %s", exc)
+                if self.owned and time.monotonic() >= self._valid_until:
+                    logger.warning("Leases of worker %s expired, stopping checks of its buckets", self.worker_id)
+                    self._set_owned(frozenset())
+            await asyncio.sleep(self.heartbeat_sec)
+
+    async def release(self) -> None:
+        """Give up all buckets right away so other workers can take them over."""
+        owned = sorted(self.owned)
+        self._set_owned(frozenset())
+        if self.store.pool is None:
+            return
+        async with self.store.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(_RELEASE_SQL, self.worker_id, owned)
+                await conn.execute("DELETE FROM pinger_workers WHERE worker_id = $1", self.worker_id)
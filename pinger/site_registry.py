@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Callable
+
+import asyncpg
+
+from pg_writer import PostgresWriter
+from sharding import LeaseManager, StaticPartition
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "sites_changed"
+
+# Тот же триггер создаётся в postgres/init/init.sql; пингер ставит его сам для уже развёрнутых баз.
+# Уведомление уходит только при изменении настроек сайта, а не при записи пингером last_*/history.
+_INSTALL_TRIGGER_SQL = """
+    CREATE OR REPLACE FUNCTION notify_sites_changed()
+    RETURNS TRIGGER AS $$
+    BEGIN
+      IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('sites_changed', json_build_object('op', TG_OP, 'id', OLD.id)::text);
+        RETURN OLD;
+      END IF;
+      IF TG_OP = 'UPDATE'
+         AND NEW.url IS NOT DISTINCT FROM OLD.url
+         AND NEW.name IS NOT DISTINCT FROM OLD.name
+         AND NEW.com IS NOT DISTINCT FROM OLD.com
+         AND NEW.ping_interval IS NOT DISTINCT FROM OLD.ping_interval THEN
+        RETURN NEW;
+      END IF;
+      PERFORM pg_notify('sites_changed', json_build_object('op', TG_OP, 'id', NEW.id)::text);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_sites_notify ON sites;
+    CREATE TRIGGER trg_sites_notify
+    AFTER INSERT OR DELETE OR UPDATE OF url, name, com, ping_interval ON sites
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_sites_changed();
+"""
+_INSTALL_LOCK_KEY = 0x5175_0009
+
+
+class SiteRegistry:
+    """In-memory copy of the sites table kept current through LISTEN/NOTIFY.
+
+    The full table (with history) is read once; afterwards only rows named
+    in notifications are fetched. Missed notifications are covered by a
+    config-only resync after every reconnect and every resync_sec. Without
+    a working listener the registry falls back to polling every
+    poll_interval seconds. With sharding (leased buckets or a static
+    partition) only this worker's sites are kept, and a change of owned
+    buckets triggers a resync.
+    """
+
+    def __init__(
+        self,
+        store: PostgresWriter,
+        *,
+        on_upsert: Callable[[dict], None],
+        on_remove: Callable[[int], None],
+        resync_sec: float = 300.0,
+        poll_interval: float = 5.0,
+        debounce_sec: float = 0.2,
+        sharding: LeaseManager | StaticPartition | None = None,
+    ) -> None:
+        self.store = store
+        self.on_upsert = on_upsert
+        self.on_remove = on_remove
+        self.resync_sec = resync_sec
+        self.poll_interval = poll_interval
+        self.debounce_sec = debounce_sec
+        self.sites: dict[int, dict] = {}
+        self._dirty: set[int] = set()
+        self._dirty_event = asyncio.Event()
+        self._loaded = False
+        self._resync_requested = False
+        self.sharding = None
+        self.set_sharding(sharding)
+
+    def __len__(self) -> int:
+        return len(self.sites)
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            site_id = int(json.loads(payload)["id"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed %s payload: %r", channel, payload)
+            return
+        self._dirty.add(site_id)
+        self._dirty_event.set()
+
+    def set_sharding(self, sharding: LeaseManager | StaticPartition | None) -> None:
+        self.sharding = sharding
+        if sharding is not None:
+            sharding.on_change = self.request_resync
+        self.request_resync()
+
+    def request_resync(self) -> None:
+        self._resync_requested = True
+        self._dirty_event.set()
+
+    def _shard(self) -> tuple[int, list[int]] | None:
+        return self.sharding.sql_filter() if self.sharding is not None else None
+
+    def _upsert(self, site: dict) -> None:
+        self.sites.setdefault(site["id"], site)
+        self.on_upsert(site)
+
+    def _remove(self, site_id: int) -> None:
+        if self.sites.pop(site_id, None) is not None:
+            self.on_remove(site_id)
+
+    async def apply(self, ids: set[int]) -> None:
+        """Re-read the given sites; rows that no longer exist (or are not ours) are removed."""
+        sites = await self.store.fetch_sites(sorted(ids), self._shard())
+        for site in sites:
+            self._upsert(site)
+        for site_id in ids - {site["id"] for site in sites}:
+            self._remove(site_id)
+
+    async def resync(self) -> None:
+        """Reconcile with the table; history is only read for sites not seen before."""
+        shard = self._shard()
+        if not self._loaded:
+            sites = await self.store.fetch_sites(shard=shard)
+            for site in sites:
+                self._upsert(site)
+            self._loaded = True
+            logger.info("Загружено %d сервисов для проверки", len(sites))
+            return
+
+        configs = await self.store.fetch_site_configs(shard)
+        seen = set()
+        new_ids = set()
+        for config in configs:
+            seen.add(config["id"])
+            if config["id"] in self.sites:
+                self._upsert(config)
+            else:
+                new_ids.add(config["id"])
+        if new_ids:
+            await self.apply(new_ids)
+        for site_id in [site_id for site_id in self.sites if site_id not in seen]:
+            self._remove(site_id)
+
+    async def _listen(self) -> asyncpg.Connection | None:
+        try:
+            conn = await asyncpg.connect(self.store.dsn)
+        except Exception as exc:
+            logger.warning("Cannot open LISTEN connection: %s", exc)
+            return None
+        try:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", _INSTALL_LOCK_KEY)
+                await conn.execute(_INSTALL_TRIGGER_SQL)
+            await conn.add_listener(CHANNEL, self._on_notify)
+        except Exception as exc:
+            logger.warning("LISTEN %s is unavailable, polling sites every %ss: %s", CHANNEL, self.poll_interval, exc)
+            await conn.close()
+            return None
+        return conn
+
+    async def run(self) -> None:
+        """Keep the registry in sync forever, reconnecting the listener on failure."""
+        while True:
+            conn = await self._listen()
+            # После (пере)подключения уведомления могли потеряться — сверяемся с таблицей
+            self._dirty.clear()
+            self._resync_requested = False
+            try:
+                await self.resync()
+            except Exception as exc:
+                logger.error("[!] Не удалось загрузить список сервисов: %s", exc)
+            try:
+                await self._follow(conn)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    async def _follow(self, conn: asyncpg.Connection | None) -> None:
+        period = self.resync_sec if conn is not None else self.poll_interval
+        if not self._loaded:
+            period = min(period, self.poll_interval)
+        next_resync = time.monotonic() + period
+        # В режиме опроса периодически пробуем снова поднять LISTEN
+        retry_listen_at = time.monotonic() + self.resync_sec
+        while not conn.is_closed() if conn is not None else time.monotonic() < retry_listen_at:
+            timeout = max(0.0, next_resync - time.monotonic())
+            if conn is not None:
+                # Регулярно просыпаемся, чтобы заметить обрыв LISTEN-соединения
+                timeout = min(timeout, 5.0)
+            try:
+                await asyncio.wait_for(self._dirty_event.wait(), timeout=timeout)
+                await asyncio.sleep(self.debounce_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty_event.clear()
+            try:
+                if self._dirty:
+                    ids, self._dirty = self._dirty, set()
+                    await self.apply(ids)
+                if self._resync_requested or time.monotonic() >= next_resync:
+                    self._resync_requested = False
+                    await self.resync()
+                    if conn is not None:
+                        period = self.resync_sec
+                    next_resync = time.monotonic() + period
+            except Exception as exc:
+                logger.error("[!] Не удалось обновить список сервисов: %s", exc)
+                if conn is not None:
+                    return
+                next_resync = time.monotonic() + period
+        if conn is not None:
+            logger.warning("LISTEN connection lost, reconnecting")
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+from typing import Callable
+
+from scheduler import format_snapshot, merge_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+class _Worker:
+    __slots__ = ("index", "process", "started_at", "restart_at", "backoff", "restarts")
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.process: multiprocessing.process.BaseProcess | None = None
+        self.started_at = 0.0
+        self.restart_at = 0.0
+        self.backoff = 0.0
+        self.restarts = 0
+
+
+def _child_main(target: Callable, index: int, count: int, health) -> None:
+    # Обработчики сигналов супервизора воркеру не нужны — он ставит свои
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    target(index, count, health)
+
+
+class Supervisor:
+    """Forks N pinger worker processes and keeps them running.
+
+    Worker i runs target(i, N, health_queue) with its own event loop. Health
+    reports put on the queue are aggregated and logged every health_interval
+    seconds. Crashed workers are restarted with exponential backoff, and a
+    worker that stops reporting for stall_timeout seconds (by default four
+    health intervals, at least two minutes) is killed and restarted as
+    well. Reports may carry the shard buckets a worker owns;
+    a bucket reported by two workers twice in a row is logged as an error,
+    since its sites are then checked and published more than once.
+    """
+
+    def __init__(
+        self,
+        target: Callable,
+        processes: int,
+        *,
+        health_interval: float = 30.0,
+        stall_timeout: float | None = None,
+        min_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.target = target
+        self.processes = max(1, processes)
+        self.health_interval = health_interval
+        self.stall_timeout = stall_timeout if stall_timeout is not None else max(120.0, 4 * health_interval)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.health: dict[int, dict] = {}
+        self._reported_at: dict[int, float] = {}
+        self._ctx = multiprocessing.get_context("fork")
+        self._queue = self._ctx.Queue()
+        self._workers = [_Worker(i) for i in range(self.processes)]
+        self._shared_buckets: set[int] = set()
+        self._stopping = False
+
+    def _spawn(self, worker: _Worker) -> None:
+        process = self._ctx.Process(
+            target=_child_main,
+            args=(self.target, worker.index, self.processes, self._queue),
+            name=f"pinger-worker-{worker.index}",
+            daemon=False,
+        )
+        process.start()
+        worker.process = process
+        worker.started_at = time.monotonic()
+        self._reported_at[worker.index] = worker.started_at
+        logger.info("Started pinger worker %d/%d (pid %s)", worker.index, self.processes, process.pid)
+
+    def _stop(self, *_) -> None:
+        self._stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for worker in self._workers:
+            self._spawn(worker)
+        next_report = time.monotonic() + self.health_interval
+        try:
+            while not self._stopping:
+                self._drain_health(timeout=1.0)
+                now = time.monotonic()
+                for worker in self._workers:
+                    self._check(worker, now)
+                if now >= next_report:
+                    self._log_health()
+                    next_report = now + self.health_interval
+        finally:
+            self._shutdown()
+
+    def _drain_health(self, timeout: float) -> None:
+        try:
+            report = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            index = report.get("worker")
+            self.health[index] = report
+            self._reported_at[index] = time.monotonic()
+            try:
+                report = self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _check(self, worker: _Worker, now: float) -> None:
+        process = worker.process
+        if process is not None and process.is_alive():
+            if now - self._reported_at.get(worker.index, now) > self.stall_timeout:
+                logger.error("Pinger worker %d stopped reporting health, killing pid %s", worker.index, process.pid)
+                process.kill()
+            return
+
+        if process is not None:
+            process.join()
+            # Упавший сразу после старта воркер перезапускаем всё реже, стабильно работавший — сразу
+            if now - worker.started_at < self.max_backoff:
+                worker.backoff = min(max(worker.backoff * 2, self.min_backoff), self.max_backoff)
+            else:
+                worker.backoff = self.min_backoff
+            worker.restart_at = now + worker.backoff
+            worker.process = None
+            self.health.pop(worker.index, None)
+            logger.error(
+                "Pinger worker %d exited with code %s, restarting in %.1fs",
+                worker.index,
+                process.exitcode,
+                worker.backoff,
+            )
+        if now >= worker.restart_at:
+            worker.restarts += 1
+            self._spawn(worker)
+
+    def _log_health(self) -> None:
+        alive = sum(1 for worker in self._workers if worker.process is not None and worker.process.is_alive())
+        sites = sum(report.get("sites", 0) for report in self.health.values())
+        checks = sum(report.get("checks", 0) for report in self.health.values())
+        throttled = sum(report.get("throttled", 0) for report in self.health.values())
+        restarts = sum(worker.restarts for worker in self._workers)
+        schedule = merge_snapshots([report.get("schedule") or {} for report in self.health.values()])
+        logger.info(
+            "Pinger workers alive %d/%d, sites %d, checks %d, throttled %d, restarts %d; schedule: %s",
+            alive,
+            self.processes,
+            sites,
+            checks,
+            throttled,
+            restarts,
+            format_snapshot(schedule),
+        )
+        # Отчёты приходят в разное время, поэтому разовое пересечение при передаче бакета не считаем
+        shared = self.shared_buckets()
+        persistent = shared & self._shared_buckets
+        if persistent:
+            logger.error(
+                "Pinger workers share %d buckets (%s): their sites are checked more than once",
+                len(persistent),
+                ", ".join(str(bucket) for bucket in sorted(persistent)[:10]),
+            )
+        self._shared_buckets = shared
+
+    def shared_buckets(self) -> set[int]:
+        """Buckets that more than one worker reports as its own."""
+        seen: set[int] = set()
+        shared: set[int] = set()
+        for report in self.health.values():
+            buckets = set(report.get("buckets") or ())
+            shared |= seen & buckets
+            seen |= buckets
+        return shared
+
+    def _shutdown(self, timeout: float = 20.0) -> None:
+        processes = [worker.process for worker in self._workers if worker.process is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
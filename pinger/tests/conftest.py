@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Модули пингера импортируются «плоско», как при запуске из каталога pinger
+PINGER_DIR = Path(__file__).resolve().parents[1]
+for path in (PINGER_DIR, PINGER_DIR.parent):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+
+import pytest
+
+import pinger_loop
+import sharding
+from sharding import LeaseManager
+from supervisor import Supervisor
+
+BUCKETS = 8
+
+
+class _LeaseTable:
+    """In-memory pinger_workers/pinger_leases standing in for the Postgres pool."""
+
+    def __init__(self, buckets: int) -> None:
+        self.workers: set[str] = set()
+        self.leases: dict[int, str | None] = dict.fromkeys(range(buckets))
+        self.pool = self
+
+    def acquire(self):
+        return self
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc) -> bool:
+        return False
+
+    async def execute(self, sql: str, *args) -> None:
+        if sql == sharding._HEARTBEAT_SQL:
+            self.workers.add(args[0])
+        elif sql == sharding._RELEASE_SQL:
+            worker_id, buckets = args
+            for bucket in buckets:
+                if self.leases[bucket] == worker_id:
+                    self.leases[bucket] = None
+
+    async def fetchval(self, sql: str, *args) -> int:
+        return len(self.workers)
+
+    async def fetch(self, sql: str, *args) -> list[dict]:
+        if sql == sharding._RENEW_SQL:
+            return [{"bucket": b} for b, owner in self.leases.items() if owner == args[0]]
+        if sql == sharding._ACQUIRE_SQL:
+            worker_id, _, limit = args
+            free = [b for b, owner in self.leases.items() if owner is None][:limit]
+            for bucket in free:
+                self.leases[bucket] = worker_id
+            return [{"bucket": b} for b in free]
+        raise AssertionError(f"unexpected query: {sql}")
+
+
+def _report(index: int, count: int, results) -> None:
+    pinger_loop._setup_worker(index, count, None)
+    shards = pinger_loop.SITE_REGISTRY.sharding
+    results.put((index, getattr(shards, "worker_id", None), sorted(shards.owned), pinger_loop.ICMP._ident))
+
+
+def _fork_workers(count: int) -> list[tuple]:
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_report, args=(index, count, results)) for index in range(count)]
+    for process in processes:
+        process.start()
+    reports = sorted(results.get(timeout=10) for _ in processes)
+    for process in processes:
+        process.join(10)
+        assert process.exitcode == 0
+    return reports
+
+
+@pytest.fixture
+def restore_worker_state(monkeypatch):
+    monkeypatch.setattr(pinger_loop, "ICMP", pinger_loop.ICMP)
+    monkeypatch.setattr(pinger_loop.SITE_REGISTRY, "sharding", pinger_loop.SITE_REGISTRY.sharding)
+
+
+def test_static_partition_children_own_disjoint_buckets(monkeypatch, restore_worker_state):
+    monkeypatch.setattr(pinger_loop, "SHARDS", None)
+    reports = _fork_workers(2)
+    (_, _, first, _), (_, _, second, _) = reports
+    assert not set(first) & set(second)
+    assert set(first) | set(second) == {0, 1}
+
+
+def test_lease_children_get_own_identity(monkeypatch, restore_worker_state):
+    monkeypatch.setattr(pinger_loop, "SHARDS", pinger_loop._lease_manager(""))
+    reports = _fork_workers(2)
+    worker_ids = {worker_id for _, worker_id, _, _ in reports}
+    idents = {ident for _, _, _, ident in reports}
+    assert len(worker_ids) == 2
+    assert pinger_loop.SHARDS.worker_id not in worker_ids
+    assert len(idents) == 2
+    assert os.getpid() & 0xFFFF not in idents
+
+
+def test_forked_lease_workers_end_up_with_disjoint_buckets(monkeypatch, restore_worker_state):
+    monkeypatch.setattr(pinger_loop, "SHARDS", pinger_loop._lease_manager(""))
+    worker_ids = [worker_id for _, worker_id, _, _ in _fork_workers(2)]
+    table = _LeaseTable(BUCKETS)
+    managers = [LeaseManager(table, worker_id=worker_id, buckets=BUCKETS) for worker_id in worker_ids]
+
+    async def rebalance() -> None:
+        for _ in range(3):
+            for manager in managers:
+                await manager.tick()
+
+    asyncio.run(rebalance())
+    first, second = (manager.owned for manager in managers)
+    assert first and second
+    assert not first & second
+    assert first | second == set(range(BUCKETS))
+
+
+@pytest.mark.parametrize("interval, expected", [(30.0, 120.0), (60.0, 240.0), (300.0, 1200.0)])
+def test_supervisor_stall_timeout_outlasts_health_interval(interval, expected):
+    assert Supervisor(lambda *args: None, 2, health_interval=interval).stall_timeout == expected
+
+
+def test_supervisor_reports_buckets_shared_by_workers(caplog):
+    supervisor = Supervisor(lambda *args: None, 2)
+    supervisor.health = {0: {"buckets": [0, 1, 2]}, 1: {"buckets": [2, 3]}}
+    assert supervisor.shared_buckets() == {2}
+
+    with caplog.at_level(logging.ERROR, logger="supervisor"):
+        supervisor._log_health()
+        assert not caplog.records
+        supervisor._log_health()
+    assert "share 1 buckets (2)" in caplog.text
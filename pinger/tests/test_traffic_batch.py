@@ -0,0 +1,164 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from history import MetricHistory  # noqa: E402
+from pinger_checks import traffic_light_from_history  # noqa: E402
+from traffic_batch import HISTORY_WIDTH, evaluate, traffic_lights  # noqa: E402
+
+GREEN = {
+    "http_status": 200,
+    "latency_ms": 100,
+    "ping_ms": 12.5,
+    "ssl_days_left": 90,
+    "dns_resolved": True,
+    "redirects": 0,
+}
+NONE = dict.fromkeys(GREEN)
+
+
+def _site(**metrics) -> dict:
+    return {**GREEN, **metrics}
+
+
+def _ring(history: list[dict], capacity: int = 10) -> MetricHistory:
+    ring = MetricHistory(capacity=capacity)
+    for entry in history:
+        ring.append(entry)
+    return ring
+
+
+def _random_metrics(rng: random.Random) -> dict:
+    def pick(*values):
+        return rng.choice(values)
+
+    return {
+        "http_status": pick(None, 0, 200, 204, 301, 404, 499, 500, 502, 503, 599),
+        "latency_ms": pick(None, 0, 100, 1500, 1501, 2500, 2501, 5000, 5001),
+        "ping_ms": pick(None, 0.0, 12.5, 600.0, 600.5, 1200.0, 1200.5, 1500.0, 1500.5),
+        "ssl_days_left": pick(None, -3, 0, 1, 6, 7, 90),
+        "dns_resolved": pick(None, False, True, True, True),
+        "redirects": pick(None, 0, 5, 6),
+    }
+
+
+def _random_sites(seed: int, count: int) -> tuple[list[dict], list[list[dict]]]:
+    rng = random.Random(seed)
+    currents, histories = [], []
+    for _ in range(count):
+        history = []
+        for _ in range(rng.randint(0, 6)):
+            entry = _random_metrics(rng)
+            if rng.random() < 0.1:
+                entry.pop("ping_ms")
+            history.append(entry)
+        currents.append(_random_metrics(rng))
+        histories.append(history)
+    return currents, histories
+
+
+def _assert_parity(currents: list[dict], histories: list) -> None:
+    expected = [
+        traffic_light_from_history(
+            h.recent(HISTORY_WIDTH) if isinstance(h, MetricHistory) else h,
+            c,
+        )
+        for c, h in zip(currents, histories)
+    ]
+    assert traffic_lights(currents, histories) == expected
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_sites_match_scalar_rules(seed):
+    _assert_parity(*_random_sites(seed, 5000))
+
+
+@pytest.mark.parametrize("seed", [3, 4])
+def test_random_sites_with_ring_histories_match_scalar_rules(seed):
+    currents, histories = _random_sites(seed, 2000)
+    rng = random.Random(seed)
+    _assert_parity(currents, [_ring(h, capacity=rng.randint(1, 6)) for h in histories])
+
+
+def test_no_sites():
+    assert traffic_lights([], []) == []
+
+
+@pytest.mark.parametrize("history", [None, [], _ring([])], ids=["none", "empty", "empty-ring"])
+def test_empty_history(history):
+    currents = [GREEN, _site(http_status=503), _site(latency_ms=None), NONE]
+    _assert_parity(currents, [history] * len(currents))
+
+
+def test_all_none():
+    assert traffic_lights([NONE], [[NONE] * 6]) == ["red"]
+    _assert_parity([NONE, _site(ping_ms=None, ssl_days_left=None, redirects=None)], [[NONE] * 6, [NONE] * 6])
+
+
+@pytest.mark.parametrize(
+    "statuses, expected",
+    [
+        ([], "orange"),
+        ([200, 200, 200, 200], "orange"),
+        ([200, 200, 200, 503], "red"),
+        ([500, 200, 502, 200], "red"),
+        ([500, 200, 200, 200], "orange"),
+        ([503, 503, 503, 200], "red"),
+        ([None, None, None, 502], "red"),
+        ([500, 500, 500, 500, 200, 200, 200, 200], "orange"),
+    ],
+)
+def test_5xx_streaks(statuses, expected):
+    history = [_site(http_status=status) for status in statuses]
+    assert traffic_lights([_site(http_status=500)], [history]) == [expected]
+    _assert_parity([_site(http_status=500)], [history])
+    _assert_parity([_site(http_status=500)], [_ring(history)])
+
+
+@pytest.mark.parametrize(
+    "latency, expected",
+    [(0, "green"), (1500, "green"), (1501, "orange"), (2500, "orange"), (2501, "red"), (5001, "red")],
+)
+def test_latency_boundaries(latency, expected):
+    assert traffic_lights([_site(latency_ms=latency)], [[]]) == [expected]
+
+
+@pytest.mark.parametrize(
+    "ping, previous, expected",
+    [
+        (600.0, None, "green"),
+        (600.5, None, "orange"),
+        (1500.0, None, "orange"),
+        (1500.5, None, "red"),
+        (1200.5, 1200.5, "red"),
+        (1200.5, 1200.0, "orange"),
+        (None, 1300.0, "green"),
+    ],
+)
+def test_ping_boundaries(ping, previous, expected):
+    history = [_site(ping_ms=previous)] if previous is not None else []
+    assert traffic_lights([_site(ping_ms=ping)], [history]) == [expected]
+    _assert_parity([_site(ping_ms=ping)], [history])
+
+
+@pytest.mark.parametrize(
+    "metrics, expected",
+    [
+        ({"ssl_days_left": 0}, "red"),
+        ({"ssl_days_left": 6}, "orange"),
+        ({"ssl_days_left": 7}, "green"),
+        ({"dns_resolved": False}, "red"),
+        ({"redirects": 5}, "green"),
+        ({"redirects": 6}, "orange"),
+        ({"http_status": 404}, "orange"),
+    ],
+)
+def test_other_boundaries(metrics, expected):
+    assert traffic_lights([_site(**metrics)], [[]]) == [expected]
+
+
+def test_evaluate_accepts_history_narrower_than_window():
+    codes = evaluate([500], [100], [10], [90], [True], [0], [[500.0]], [[10.0]])
+    assert codes.tolist() == [2]
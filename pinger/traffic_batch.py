@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from history import TRAFFIC_LIGHTS, MetricHistory
+from pinger_checks import traffic_light_from_history
+
+GREEN, ORANGE, RED = (TRAFFIC_LIGHTS.index(name) for name in ("green", "orange", "red"))
+# Сколько прошлых проверок смотрит traffic_light_from_history
+HISTORY_WIDTH = 4
+
+
+def evaluate(status, latency, ping, ssl_days, dns, redirects, history_status, history_ping):
+    """Traffic-light codes (indexes into TRAFFIC_LIGHTS) for many sites at once.
+
+    Current metrics are 1-D float arrays of length n with NaN for None; dns
+    is a boolean array. history_status and history_ping are (n, k) arrays of
+    past checks, oldest first and right-aligned, padded with NaN. The rules
+    and their order are exactly those of traffic_light_from_history.
+    """
+    status = np.asarray(status, dtype=np.float64)
+    latency = np.asarray(latency, dtype=np.float64)
+    ping = np.asarray(ping, dtype=np.float64)
+    ssl_days = np.asarray(ssl_days, dtype=np.float64)
+    dns = np.asarray(dns, dtype=bool)
+    redirects = np.asarray(redirects, dtype=np.float64)
+    history_status = np.asarray(history_status, dtype=np.float64).reshape(len(status), -1)[:, -HISTORY_WIDTH:]
+    history_ping = np.asarray(history_ping, dtype=np.float64).reshape(len(status), -1)[:, -HISTORY_WIDTH:]
+
+    # NaN в любом сравнении даёт False, поэтому пустая история и None отсекаются сами
+    with np.errstate(invalid="ignore"):
+        server_error = status >= 500
+        prev_status = history_status[:, -1] if history_status.shape[1] else np.full(len(status), np.nan)
+        prev_ping = history_ping[:, -1] if history_ping.shape[1] else np.full(len(status), np.nan)
+        errors = (history_status >= 500).sum(axis=1) + server_error
+
+        conditions = (
+            (np.isnan(status), RED),
+            (server_error & (prev_status >= 500), RED),
+            (server_error & (errors > 2), RED),
+            (server_error, ORANGE),
+            ((status >= 400) & (status < 500), ORANGE),
+            (np.isnan(latency) | (latency > 2500), RED),
+            (latency > 1500, ORANGE),
+            ((prev_ping > 1200) & (ping > 1200), RED),
+            (ping > 1500, RED),
+            (ping > 600, ORANGE),
+            (ssl_days <= 0, RED),
+            (ssl_days < 7, ORANGE),
+            (~dns, RED),
+            (redirects > 5, ORANGE),
+        )
+    return np.select([mask for mask, _ in conditions], [code for _, code in conditions], default=GREEN).astype(np.int8)
+
+
+def _number(value) -> float:
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _history_row(history, name: str) -> list[float]:
+    if isinstance(history, MetricHistory):
+        return history.values(name, HISTORY_WIDTH)
+    # Как и в скалярной версии, отсутствующий ключ в прошлой записи считается пустым
+    return [_number(entry.get(name)) for entry in (history or [])[-HISTORY_WIDTH:]]
+
+
+def _history_matrix(histories: Sequence, name: str):
+    padding = [math.nan] * HISTORY_WIDTH
+    rows = []
+    for history in histories:
+        values = _history_row(history, name)
+        rows.append(padding[len(values):] + values)
+    return np.array(rows, dtype=np.float64).reshape(len(rows), HISTORY_WIDTH)
+
+
+def traffic_lights(currents: Sequence[dict], histories: Sequence) -> list[str]:
+    """Traffic lights for current metric dicts and their histories.
+
+    A history is a list of past logs dicts or a MetricHistory. Converting
+    dicts costs more than the rules themselves, so this suits bulk
+    re-evaluation; callers that already hold columns should use evaluate().
+    Falls back to the scalar rules when NumPy is not installed.
+    """
+    if np is None:
+        return [
+            traffic_light_from_history(
+                history.recent(HISTORY_WIDTH) if isinstance(history, MetricHistory) else list(history or []),
+                current,
+            )
+            for current, history in zip(currents, histories)
+        ]
+    if not currents:
+        return []
+    codes = evaluate(
+        [_number(c.get("http_status")) for c in currents],
+        [_number(c.get("latency_ms")) for c in currents],
+        [_number(c.get("ping_ms")) for c in currents],
+        [_number(c.get("ssl_days_left")) for c in currents],
+        [bool(c.get("dns_resolved")) for c in currents],
+        [_number(c.get("redirects")) for c in currents],
+        _history_matrix(histories, "http_status"),
+        _history_matrix(histories, "ping_ms"),
+    )
+    return [TRAFFIC_LIGHTS[code] for code in codes.tolist()]
+
@@ -31,6 +31,45 @@ BEFORE UPDATE ON sites
 FOR EACH ROW
 EXECUTE FUNCTION set_updated_at();
 
+-- Уведомление пингера об изменении настроек сайта (LISTEN sites_changed)
+CREATE OR REPLACE FUNCTION notify_sites_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM pg_notify('sites_changed', json_build_object('op', TG_OP, 'id', OLD.id)::text);
+    RETURN OLD;
+  END IF;
+  IF TG_OP = 'UPDATE'
+     AND NEW.url IS NOT DISTINCT FROM OLD.url
+     AND NEW.name IS NOT DISTINCT FROM OLD.name
+     AND NEW.com IS NOT DISTINCT FROM OLD.com
+     AND NEW.ping_interval IS NOT DISTINCT FROM OLD.ping_interval THEN
+    RETURN NEW;
+  END IF;
+  PERFORM pg_notify('sites_changed', json_build_object('op', TG_OP, 'id', NEW.id)::text);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_sites_notify ON sites;
+CREATE TRIGGER trg_sites_notify
+AFTER INSERT OR DELETE OR UPDATE OF url, name, com, ping_interval ON sites
+FOR EACH ROW
+EXECUTE FUNCTION notify_sites_changed();
+
+-- Шардирование пингера: живые воркеры и аренда бакетов (site_id % число бакетов)
+CREATE TABLE IF NOT EXISTS pinger_workers (
+    worker_id TEXT PRIMARY KEY,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS pinger_leases (
+    bucket INTEGER PRIMARY KEY,
+    worker_id TEXT,
+    expires_at TIMESTAMPTZ NOT NULL DEFAULT 'epoch'
+);
+
 
 CREATE TABLE IF NOT EXISTS site_logs (
     id SERIAL PRIMARY KEY,
@@ -46,6 +85,11 @@ CREATE TABLE IF NOT EXISTS site_logs (
     redirects INTEGER,
     errors_last INTEGER,
     ping_interval INTEGER,
+    dns_ms DOUBLE PRECISION,             -- фазы запроса, мс
+    connect_ms DOUBLE PRECISION,
+    tls_ms DOUBLE PRECISION,
+    ttfb_ms DOUBLE PRECISION,
+    download_ms DOUBLE PRECISION,
     raw_logs JSONB NOT NULL DEFAULT '{}',
     created_at TIMESTAMP DEFAULT NOW()
 );